@@ -0,0 +1,118 @@
+"""
+Drive Koda.checkin with GitHub proofs against the local fake GitHub server and
+report throughput and latency percentiles.
+
+    python -m benchmarks.checkin_benchmark --users 2000 --concurrency 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from src.API.koda import Koda
+from src.API.github import GithubClient
+from src.API.model import (
+    Checkin,
+    CheckinSettings,
+    LevelingSettings,
+    GithubSettings,
+    User
+)
+from src.Database.in_memory_database_facade import InMemoryDatabaseFacade
+from src.Database.in_memory_db import InMemoryDatabase
+from src.Database.model import DatabaseSettings
+
+from .fake_github import FakeGithubServer
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def run(args: argparse.Namespace) -> None:
+    server = FakeGithubServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit
+    )
+    url = await server.start()
+
+    save_folder = tempfile.mkdtemp(prefix="koda_bench_")
+    database_facade = InMemoryDatabaseFacade(
+        InMemoryDatabase("KodaBenchDB"),
+        DatabaseSettings(save_filename="db.json", save_folder=save_folder)
+    )
+    github_client = GithubClient(GithubSettings(
+        graphql_url=url,
+        max_connections=args.connections,
+        rate_limit=args.rate_limit
+    ))
+    koda = Koda(
+        "templates",
+        database_facade,
+        CheckinSettings(base_cooldown=timedelta(hours=16)),
+        LevelingSettings(checkin_reward=500),
+        github_client
+    )
+
+    user_ids = [str(100000 + i) for i in range(args.users)]
+    for user_id in user_ids:
+        await koda.establish_new_user(User(id=user_id))
+        await koda.register_github_name(user_id, f"bench-user-{user_id}")
+
+    latencies: list[float] = []
+    outcomes: Counter = Counter()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_checkin(user_id: str) -> None:
+        checkin = Checkin(
+            user_id=user_id,
+            date=datetime.now(),
+            proof=f"bench-user-{user_id}"
+        )
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await koda.checkin(user_id, checkin)
+                outcomes["ok"] += 1
+            except Exception as e:
+                outcomes[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_checkin(user_id) for user_id in user_ids))
+    elapsed = time.perf_counter() - started
+
+    await koda.close()
+    await server.stop()
+
+    print(f"checkins:     {len(latencies)} ({dict(outcomes)})")
+    print(f"concurrency:  {args.concurrency}, GitHub latency {args.latency * 1000:.0f}ms")
+    print(f"elapsed:      {elapsed:.2f}s")
+    print(f"throughput:   {len(latencies) / elapsed:.1f} checkins/s")
+    print(f"p50 latency:  {percentile(latencies, 0.50) * 1000:.1f}ms")
+    print(f"p99 latency:  {percentile(latencies, 0.99) * 1000:.1f}ms")
+    print(f"GitHub calls: {server.requests_served}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="distinct users, one checkin each")
+    parser.add_argument("--concurrency", type=int, default=50, help="checkins in flight at once")
+    parser.add_argument("--connections", type=int, default=10, help="GitHub client connection pool size")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=5000)
+    args = parser.parse_args()
+
+    # Per-checkin debug logging would dominate the measurement
+    logging.disable(logging.INFO)
+    asyncio.run(run(args))
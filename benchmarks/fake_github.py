@@ -0,0 +1,195 @@
+"""
+Local stand-in for GitHub's GraphQL endpoint.
+
+Serves synthetic contribution calendars for the queries GithubClient sends,
+with configurable latency, error rate and rate limit headers. Point the bot at
+it with GITHUB_GRAPHQL_URL=http://127.0.0.1:8765/graphql
+
+    python -m benchmarks.fake_github --port 8765 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from aiohttp import web
+
+
+class FakeGithubServer:
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: int = 5000,
+        reset_interval: float = 3600.0,
+        unknown_prefix: str = "ghost",
+        seed: int = 0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.reset_interval = reset_interval
+        self.unknown_prefix = unknown_prefix
+        self.random = random.Random(seed)
+
+        self.remaining = rate_limit
+        # GitHub resets on whole epoch seconds, matching the X-RateLimit-Reset header
+        self.reset_at = math.ceil(time.time() + reset_interval)
+        self.requests_served = 0
+
+        self._runner: Optional[web.AppRunner] = None
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/graphql", self.handle_graphql)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """ Serve in the background, returns the GraphQL URL
+        """
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}/graphql"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle_graphql(self, request: web.Request) -> web.Response:
+        self.requests_served += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+        now = time.time()
+        if now >= self.reset_at:
+            self.remaining = self.rate_limit
+            self.reset_at = math.ceil(now + self.reset_interval)
+
+        if self.remaining <= 0:
+            return web.json_response(
+                {"message": "API rate limit exceeded"},
+                status=403,
+                headers=self._rate_limit_headers()
+            )
+        self.remaining -= 1
+
+        if self.random.random() < self.error_rate:
+            return web.json_response({"message": "Server Error"}, status=502, headers=self._rate_limit_headers())
+
+        body = await request.json()
+        variables: dict = body.get("variables", {})
+        start = _parse_day(variables["from"])
+        end = _parse_day(variables["to"])
+
+        # Single lookups send $login, batched ones alias u<i> for $l<i>
+        if "login" in variables:
+            aliases = {"user": variables["login"]}
+        else:
+            aliases = {
+                f"u{key[1:]}": login
+                for key, login in variables.items()
+                if key.startswith("l") and key[1:].isdigit()
+            }
+
+        data: dict = {"rateLimit": self._rate_limit_object()}
+        errors: list[dict] = []
+        for alias, login in aliases.items():
+            if login.lower().startswith(self.unknown_prefix):
+                data[alias] = None
+                errors.append({
+                    "type": "NOT_FOUND",
+                    "path": [alias],
+                    "message": f"Could not resolve to a User with the login of '{login}'."
+                })
+            else:
+                data[alias] = self._user(login, start, end)
+
+        payload: dict = {"data": data}
+        if errors:
+            payload["errors"] = errors
+        return web.json_response(payload, headers=self._rate_limit_headers())
+
+    def _user(self, login: str, start: date, end: date) -> dict:
+        weeks: list[dict] = []
+        day = start
+        while day <= end:
+            if not weeks or len(weeks[-1]["contributionDays"]) == 7:
+                weeks.append({"contributionDays": []})
+            weeks[-1]["contributionDays"].append({
+                "date": day.isoformat(),
+                "contributionCount": _synthetic_count(login, day)
+            })
+            day += timedelta(days=1)
+
+        return {"contributionsCollection": {"contributionCalendar": {"weeks": weeks}}}
+
+    def _rate_limit_headers(self) -> dict[str, str]:
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(max(0, self.remaining)),
+            "X-RateLimit-Reset": str(int(self.reset_at)),
+            "X-RateLimit-Resource": "graphql"
+        }
+
+    def _rate_limit_object(self) -> dict:
+        reset_at = datetime.fromtimestamp(self.reset_at, timezone.utc)
+        return {
+            "limit": self.rate_limit,
+            "cost": 1,
+            "remaining": max(0, self.remaining),
+            "resetAt": reset_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+        }
+
+
+def _parse_day(value: str) -> date:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+
+
+def _synthetic_count(login: str, day: date) -> int:
+    """ Stable per (login, day): roughly 60% of days have 1-9 contributions
+    """
+    h = zlib.crc32(f"{login.lower()}:{day.isoformat()}".encode())
+    return 0 if h % 10 < 4 else 1 + (h >> 8) % 9
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = FakeGithubServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        reset_interval=args.reset_interval
+    )
+    url = await server.start(args.host, args.port)
+    print(f"Fake GitHub GraphQL listening on {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 502")
+    parser.add_argument("--rate-limit", type=int, default=5000, help="requests allowed per reset interval")
+    parser.add_argument("--reset-interval", type=float, default=3600.0, help="seconds between budget resets")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
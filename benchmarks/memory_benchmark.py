@@ -0,0 +1,73 @@
+"""
+Memory held by loaded checkin data: pydantic models keyed by uuid4 strings
+(how records were kept before) against the compact rows InMemoryDatabase
+keeps now. Reports bytes per checkin and MB per 100k checkins.
+
+    python -m benchmarks.memory_benchmark --checkins 100000
+"""
+import argparse
+import gc
+import tracemalloc
+import uuid
+from typing import Callable
+
+from src.Database.in_memory_db import InMemoryDatabase
+from src.Database.schema import Schema
+from src.Database.snapshot_codec import JsonCodec
+
+from .snapshot_benchmark import build_schema
+
+
+def measure(build: Callable[[], object]) -> tuple[object, int]:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main(args: argparse.Namespace) -> None:
+    schema = build_schema(args.checkins, max(1, args.checkins // args.checkins_per_user))
+
+    # Same data with uuid4 checkin ids, serialized the way snapshots were
+    ids = {checkin_id: str(uuid.uuid4()) for checkin_id in schema.checkins}
+    schema.checkins = {ids[key]: checkin for key, checkin in schema.checkins.items()}
+    schema.user_checkins = {key: [ids[i] for i in history] for key, history in schema.user_checkins.items()}
+    for user in schema.users.values():
+        user.last_checkin_id = ids.get(user.last_checkin_id)
+    legacy = JsonCodec().encode(schema)
+
+    # Ids as the bot hands them out now
+    renumbered = {checkin_id: str(number) for number, checkin_id in enumerate(schema.checkins, start=1)}
+    schema.checkins = {renumbered[key]: checkin for key, checkin in schema.checkins.items()}
+    schema.user_checkins = {key: [renumbered[i] for i in history] for key, history in schema.user_checkins.items()}
+    for user in schema.users.values():
+        user.last_checkin_id = renumbered.get(user.last_checkin_id)
+    current = JsonCodec().encode(schema)
+    del schema
+
+    models, models_size = measure(lambda: JsonCodec().decode(legacy, Schema))
+    del models, legacy
+
+    def load_rows() -> InMemoryDatabase:
+        # The decoded models are dropped once converted, only what the rows keep counts
+        database = InMemoryDatabase("memory")
+        database.load_tables(JsonCodec().decode(current, Schema))
+        return database
+
+    rows, rows_size = measure(load_rows)
+
+    for label, size in (("models", models_size), ("rows", rows_size)):
+        print(
+            f"{label:>7}: {size / 1e6:8.1f} MB total, {size / args.checkins:6.0f} B/checkin, "
+            f"{size / args.checkins * 100_000 / 1e6:6.1f} MB per 100k checkins"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkins", type=int, default=100_000)
+    parser.add_argument("--checkins-per-user", type=int, default=50)
+    main(parser.parse_args())
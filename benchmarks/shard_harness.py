@@ -0,0 +1,186 @@
+"""
+Run several shard workers as separate processes over one save folder, the
+way run_shards.py deploys the bot, then check the result from a single
+process. Each worker only handles events for guilds on its own shards, like
+the Discord gateway delivers them. A second phase regroups the shards over a
+different number of workers to show partitions move between processes intact.
+
+    python -m benchmarks.shard_harness --guilds 40 --users 25 --rounds 4 --workers 4
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from src.API.exceptions import PartitionNotOwnedError
+from src.API.guild_partitions import GuildPartitions
+from src.API.koda import Koda
+from src.API.leveling import DEFAULT_LEVEL_CURVE
+from src.API.model import (
+    Checkin,
+    CheckinSettings,
+    LevelingSettings,
+    ShardSettings,
+    User
+)
+from src.Database.in_memory_database_facade import InMemoryDatabaseFacade
+from src.Database.in_memory_db import InMemoryDatabase
+from src.Database.model import DatabaseSettings
+
+CHECKIN_REWARD = 500
+GRANT = 150
+START = datetime(2025, 1, 1)
+
+
+def create_koda(database_settings: DatabaseSettings) -> Koda:
+    return Koda(
+        "templates",
+        InMemoryDatabaseFacade(InMemoryDatabase("KodaDB"), database_settings),
+        CheckinSettings(base_cooldown=timedelta(hours=16)),
+        LevelingSettings(checkin_reward=CHECKIN_REWARD)
+    )
+
+
+def build_events(args: argparse.Namespace, rounds: range) -> list[tuple[int, str, int, str]]:
+    """ (guild id, user id, round, kind), every user checks in twice per round
+        and every third user also gets an xp grant
+    """
+    generator = random.Random(args.seed)
+    guild_ids: list[int] = [generator.getrandbits(40) << 22 for _ in range(args.guilds)]
+    events: list[tuple[int, str, int, str]] = []
+    for round_number in rounds:
+        # Interleaved across guilds and users, but rounds stay in order
+        round_events: list[tuple[int, str, int, str]] = []
+        for guild_id in guild_ids:
+            for user in range(args.users):
+                user_id = str(1000 + user)
+                round_events.append((guild_id, user_id, round_number, "checkin"))
+                round_events.append((guild_id, user_id, round_number, "checkin")) # too soon, no xp
+                if user % 3 == 0:
+                    round_events.append((guild_id, user_id, round_number, "grant"))
+        generator.shuffle(round_events)
+        events.extend(round_events)
+    return events
+
+
+async def run_worker(
+    folder: str,
+    shard_count: int,
+    shard_ids: list[int],
+    events: list[tuple[int, str, int, str]]
+) -> tuple[int, float]:
+    shard_settings = ShardSettings(shard_count=shard_count, shard_ids=shard_ids)
+    partitions = GuildPartitions(
+        DatabaseSettings(save_filename="db.json", save_folder=folder),
+        create_koda,
+        shard_settings=shard_settings
+    )
+    started: float = time.perf_counter()
+    partitions.load_all()
+
+    handled: int = 0
+    for guild_id, user_id, round_number, kind in events:
+        if not shard_settings.owns_guild(guild_id):
+            continue
+
+        koda: Koda = partitions.get(guild_id)
+        if await koda.new_user_detected(user_id):
+            await koda.establish_new_user(User(id=user_id))
+
+        if kind == "checkin":
+            checkin_time: datetime = START + timedelta(days=round_number)
+            await koda.checkin(user_id, Checkin(user_id=user_id, date=checkin_time, proof=f"round {round_number}"))
+        else:
+            await koda.give_xp(user_id, GRANT)
+        handled += 1
+
+    await partitions.save_all(permanent=True)
+    await partitions.close()
+    return handled, time.perf_counter() - started
+
+
+def worker(folder: str, shard_count: int, shard_ids: list[int], events: list) -> tuple[int, float]:
+    logging.disable(logging.CRITICAL)
+    return asyncio.run(run_worker(folder, shard_count, shard_ids, events))
+
+
+def run_phase(folder: str, args: argparse.Namespace, workers: int, events: list) -> None:
+    assignments: list[list[int]] = [
+        [shard_id for shard_id in range(args.shards) if shard_id % workers == index]
+        for index in range(workers)
+    ]
+    started: float = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = list(pool.map(worker, [folder] * workers, [args.shards] * workers, assignments, [events] * workers))
+
+    print(f"{workers} workers, {len(events)} events in {time.perf_counter() - started:.2f}s")
+    for shard_ids, (handled, duration) in zip(assignments, results):
+        print(f"  shards {shard_ids}: {handled} events in {duration:.2f}s")
+    if sum(handled for handled, _ in results) != len(events):
+        raise AssertionError("Some events were handled by no worker, or by more than one")
+
+
+def verify(folder: str, args: argparse.Namespace, events: list) -> None:
+    totals: dict[tuple[int, str], int] = {}
+    for guild_id, user_id, _, kind in events:
+        if kind == "grant":
+            totals[(guild_id, user_id)] = totals.get((guild_id, user_id), 0) + GRANT
+    # Only the first checkin of each round pays out
+    checkin_rounds: set[tuple[int, str, int]] = {
+        (guild_id, user_id, round_number) for guild_id, user_id, round_number, kind in events if kind == "checkin"
+    }
+    for guild_id, user_id, _ in checkin_rounds:
+        totals[(guild_id, user_id)] = totals.get((guild_id, user_id), 0) + CHECKIN_REWARD
+
+    logging.disable(logging.CRITICAL)
+    partitions = GuildPartitions(DatabaseSettings(save_filename="db.json", save_folder=folder), create_koda)
+    loaded: int = partitions.load_all()
+    if loaded != args.guilds:
+        raise AssertionError(f"Expected {args.guilds} partitions, found {loaded}")
+
+    mismatches: int = 0
+    for (guild_id, user_id), total in totals.items():
+        stats = asyncio.run(partitions.get(guild_id).get_stats(user_id))
+        if (stats.level, stats.xp) != DEFAULT_LEVEL_CURVE.apply(1, 0, total):
+            mismatches += 1
+    if mismatches:
+        raise AssertionError(f"{mismatches} users have the wrong xp")
+    print(f"Verified xp of {len(totals)} users across {loaded} guilds")
+
+    # A second process claiming the same shards is refused rather than writing the same files
+    contender = GuildPartitions(DatabaseSettings(save_filename="db.json", save_folder=folder), create_koda)
+    try:
+        contender.load_all()
+    except PartitionNotOwnedError:
+        print("Overlapping shard assignment refused")
+    else:
+        raise AssertionError("Two processes opened the same partitions")
+    asyncio.run(partitions.close())
+
+
+def main(args: argparse.Namespace) -> None:
+    folder: str = args.folder or tempfile.mkdtemp()
+    half: int = args.rounds // 2
+    first: list = build_events(args, range(half))
+    second: list = build_events(args, range(half, args.rounds))
+
+    run_phase(folder, args, args.workers, first)
+    run_phase(folder, args, max(1, args.workers // 2), second)
+    verify(folder, args, first + second)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guilds", type=int, default=40)
+    parser.add_argument("--users", type=int, default=25)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--folder", type=str, default=None, help="save folder, a temporary one when unset")
+    main(parser.parse_args())
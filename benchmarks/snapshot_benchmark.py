@@ -0,0 +1,94 @@
+"""
+Compare snapshot codecs on a synthetic Schema: encode time, decode time and
+encoded size at each checkin count.
+
+    python -m benchmarks.snapshot_benchmark --checkins 10000 100000 1000000
+"""
+import argparse
+import gc
+import random
+import time
+from datetime import datetime, timedelta
+
+from src.API.model import (
+    Checkin,
+    GithubContributionDay,
+    ProofType,
+    Stats,
+    User
+)
+from src.Database.schema import Schema
+from src.Database.snapshot_codec import (
+    CODECS,
+    encode_snapshot,
+    decode_snapshot
+)
+
+
+def build_schema(checkins: int, users: int) -> Schema:
+    rng = random.Random(checkins)
+    start = datetime(2025, 1, 1)
+    user_ids = [str(100000000000000000 + i) for i in range(users)]
+
+    schema = Schema()
+    for i in range(checkins):
+        user_id = user_ids[i % users]
+        checkin_id = f"{rng.getrandbits(128):032x}"
+        schema.checkins[checkin_id] = Checkin(
+            user_id=user_id,
+            date=start + timedelta(minutes=i),
+            proof=f"proof {i}",
+            proof_type=rng.choice(list(ProofType))
+        )
+        schema.user_checkins.setdefault(user_id, []).append(checkin_id)
+
+    for user_id in user_ids:
+        history = schema.user_checkins.get(user_id, [])
+        schema.users[user_id] = User(
+            id=user_id,
+            last_checkin_id=history[-1] if history else None,
+            last_checkin=schema.checkins[history[-1]] if history else None,
+            github_name=f"user-{user_id}",
+            last_github_contribution=GithubContributionDay(date=start.date(), count=rng.randint(1, 20))
+        )
+        schema.stats[user_id] = Stats(xp=rng.randint(0, 1000), total_xp_needed=1000, level=rng.randint(1, 50))
+    return schema
+
+
+def timed(fn, *args):
+    gc.collect()
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main(args: argparse.Namespace) -> None:
+    print(f"{'checkins':>10} {'codec':>13} {'save (s)':>9} {'load (s)':>9} {'size (MB)':>10}")
+    for count in args.checkins:
+        schema = build_schema(count, max(1, count // args.checkins_per_user))
+        expected = schema.model_dump_json() if args.verify else None
+
+        # What load_db did before codecs: validate the whole file with the collector running
+        data, save_seconds = timed(lambda: schema.model_dump_json().encode())
+        _, load_seconds = timed(Schema.model_validate_json, data)
+        print(f"{count:>10} {'baseline':>13} {save_seconds:>9.3f} {load_seconds:>9.3f} {len(data) / 1e6:>10.1f}")
+        del data
+
+        for name in args.codecs:
+            data, save_seconds = timed(encode_snapshot, schema, CODECS[name])
+            tables, load_seconds = timed(decode_snapshot, data, Schema)
+
+            if expected is not None and Schema.model_construct(**tables).model_dump_json() != expected:
+                raise AssertionError(f"{name} did not round trip at {count} checkins")
+
+            print(f"{count:>10} {name:>13} {save_seconds:>9.3f} {load_seconds:>9.3f} {len(data) / 1e6:>10.1f}")
+            del data, tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkins", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--checkins-per-user", type=int, default=50)
+    parser.add_argument("--codecs", nargs="+", default=list(CODECS), choices=list(CODECS))
+    parser.add_argument("--verify", action="store_true", help="check every codec round trips exactly")
+    main(parser.parse_args())
@@ -1,5 +1,7 @@
+import asyncio
 import os
 from datetime import timedelta
+from pathlib import Path
 
 import discord
 from discord import Message
@@ -7,14 +9,23 @@ from discord.ext import tasks
 from dotenv import load_dotenv
 
 from src.Discord.command_parser import CommandParser
-from src.Logging.logger import Logger
+from src.Discord.dispatcher import MessageDispatcher
+from src.Logging.logger import Logger, configure_logging
 from src.API.koda import Koda
+from src.API.guild_partitions import GuildPartitions
 from src.API.model import (
     CheckinSettings,
-    LevelingSettings
+    LevelingSettings,
+    GithubSettings,
+    ShardSettings,
+    DispatcherSettings
 )
+from src.API.github import GithubClient, GITHUB_GRAPHQL_URL
+from src.Database.database_facade import DatabaseFacade
 from src.Database.in_memory_database_facade import InMemoryDatabaseFacade
 from src.Database.in_memory_db import InMemoryDatabase
+from src.Database.sqlite_database_facade import SqliteDatabaseFacade
+from src.Database.sqlite_db import SqliteDatabase
 from src.Database.model import DatabaseSettings
 
 
@@ -22,35 +33,87 @@ load_dotenv()
 
 
 TOKEN = os.getenv("DISCORD_TOKEN")
+DB_BACKEND = os.getenv("KODA_DB_BACKEND", "memory") # "memory" or "sqlite"
+LEGACY_GUILD_ID = os.getenv("KODA_LEGACY_GUILD_ID") # guild that owns a store saved before partitioning
+SHARD_COUNT = int(os.getenv("KODA_SHARD_COUNT", "1"))
+SHARD_IDS = os.getenv("KODA_SHARD_IDS") # comma separated shards for this process, all of them when unset
+LOG_LEVEL = os.getenv("KODA_LOG_LEVEL", "info") # "debug", "info", "warn" or "error", for every module
+
+configure_logging(LOG_LEVEL)
 
 # Create a client with message intent
 intents = discord.Intents.default()
 intents.message_content = True  # Required to read message text
-client = discord.Client(intents=intents)
+shard_settings = ShardSettings(
+    shard_count=SHARD_COUNT,
+    shard_ids=[int(shard_id) for shard_id in SHARD_IDS.split(",")] if SHARD_IDS else None
+)
+if SHARD_COUNT > 1:
+    # Each process connects its own shards, guilds on other shards never reach it
+    client = discord.AutoShardedClient(
+        intents=intents,
+        shard_count=shard_settings.shard_count,
+        shard_ids=shard_settings.shard_ids
+    )
+else:
+    client = discord.Client(intents=intents)
 
 # Create components
 database_settings = DatabaseSettings(
     save_filename='db.json',
     save_folder='persistance'
 )
-database = InMemoryDatabase("KodaDB")
-database_facade = InMemoryDatabaseFacade(database, database_settings)
-
 checkin_settings = CheckinSettings(
     base_cooldown=timedelta(hours=16)
 )
 leveling_settings = LevelingSettings(
     checkin_reward=500
 )
-koda_api = Koda(
-    "templates",
-    database_facade, 
-    checkin_settings, 
-    leveling_settings
+github_settings = GithubSettings(
+    graphql_url=GITHUB_GRAPHQL_URL,
+    request_timeout=10.0
 )
-
-parser = CommandParser("koda", koda_api)
-LOGGER = Logger(__file__, "debug")
+github_client = GithubClient(github_settings)
+
+def create_koda(partition_settings: DatabaseSettings) -> Koda:
+    """ Every guild gets its own store under persistance/guilds/<guild id>
+    """
+    if DB_BACKEND == "sqlite":
+        database = SqliteDatabase(
+            "KodaDB",
+            Path(partition_settings.save_folder) / partition_settings.sqlite_filename
+        )
+        database_facade: DatabaseFacade = SqliteDatabaseFacade(database, partition_settings)
+    else:
+        database = InMemoryDatabase("KodaDB")
+        database_facade: DatabaseFacade = InMemoryDatabaseFacade(database, partition_settings)
+
+    return Koda(
+        "templates",
+        database_facade, 
+        checkin_settings, 
+        leveling_settings,
+        github_client
+    )
+
+LOGGER = Logger(__file__)
+
+partitions = GuildPartitions(database_settings, create_koda, shard_settings=shard_settings)
+if LEGACY_GUILD_ID:
+    # Data saved before partitioning belongs to the guild the bot used to serve
+    partitions.adopt_legacy_store(int(LEGACY_GUILD_ID))
+elif partitions.has_legacy_store():
+    # Starting anyway would serve every guild from an empty store
+    LOGGER.error(
+        "Found a store from before guild partitioning in %s/, set KODA_LEGACY_GUILD_ID "
+        "to the guild it belongs to so it can be moved into that guild's partition",
+        database_settings.save_folder
+    )
+    raise SystemExit(1)
+partitions.load_all()
+
+dispatcher = MessageDispatcher(DispatcherSettings(level_up_window=3.0))
+parser = CommandParser("koda", partitions, dispatcher)
 
 #test.create_test_data_in_db(database)
 
@@ -65,7 +128,7 @@ async def autosave_db_long_term():
 
 @client.event
 async def on_ready():
-    LOGGER.info(f"Bot connected as {client.user}")
+    LOGGER.info("Bot connected as %s", client.user)
 
     if not autosave_db_short_term.is_running():
         autosave_db_short_term.start()
@@ -79,8 +142,10 @@ async def on_message(message: Message):
     if message.author == client.user:
         return
     
-    LOGGER.debug(f"Read message: {message}")
-    LOGGER.debug(f"Contents: {message.content}")
+    # Runs for every message the bot can see, most of which aren't commands
+    if LOGGER.is_enabled_for("debug"):
+        LOGGER.debug("Read message: %s", message)
+        LOGGER.debug("Contents: %s", message.content)
     
     #await message.channel.send(f"Processing: '{message.content}'")
 
@@ -88,5 +153,25 @@ async def on_message(message: Message):
         LOGGER.debug("Command detected")
         await parser.parse_command(message)
 
+async def shutdown():
+    """ Save and close every partition once the client stops, so files,
+        connections and the GitHub session aren't left open
+    """
+    autosave_db_short_term.cancel()
+    autosave_db_long_term.cancel()
+    try:
+        await dispatcher.flush()
+        await partitions.save_all()
+    finally:
+        await partitions.close()
+        LOGGER.info("Shut down")
+
+async def main():
+    async with client:
+        try:
+            await client.start(TOKEN)
+        finally:
+            await shutdown()
+
 # Start the bot
-client.run(TOKEN)
+asyncio.run(main())
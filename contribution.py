@@ -1,10 +1,12 @@
 import os
 import discord
 from discord.ext import commands
-import requests
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
+from src.API.github import github_contribution_calendar
+from src.API.model import ContributionCalendar
+
 # --- LOAD ENV ---
 load_dotenv()
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
@@ -17,102 +19,17 @@ def date_utc(delta_days: int = 0) -> str:
     target_date = datetime.now(timezone.utc) + timedelta(days=delta_days)
     return target_date.strftime("%Y-%m-%d")
 
-def github_contribs_on_date(login: str, delta_days: int = 0) -> int:
-    """Fetch contribution count for a specific date in UTC."""
-    target_str = date_utc(delta_days)
-
-    query = """
-    query($login: String!) {
-      user(login: $login) {
-        contributionsCollection {
-          contributionCalendar {
-            weeks {
-              contributionDays { date contributionCount }
-            }
-          }
-        }
-      }
-    }"""
-
-    headers = {
-        "Accept": "application/json",
-        "User-Agent": "discord-contrib-bot",
-        "Authorization": f"Bearer {GITHUB_TOKEN}"
-    }
-
-    resp = requests.post(
-        "https://api.github.com/graphql",
-        json={"query": query, "variables": {"login": login}},
-        headers=headers
-    )
-
-    if resp.status_code != 200:
-        raise RuntimeError(f"GitHub API error: {resp.status_code} {resp.text}")
-
-    data = resp.json()
-    if "errors" in data:
-        raise RuntimeError(f"GitHub GraphQL error: {data['errors']}")
-
-    weeks = data["data"]["user"]["contributionsCollection"]["contributionCalendar"]["weeks"]
-    
-    # Count contributions for the target date
-    for week in weeks:
-        for day in week["contributionDays"]:
-            if day["date"] == target_str:
-                return int(day["contributionCount"])
-    return 0
-
-from datetime import datetime, timezone, timedelta
-
-def github_last_contrib_date(login: str, max_days: int = 3) -> str:
+async def github_recent_calendar(login: str, max_days: int = 3) -> ContributionCalendar:
     """
-    Return the most recent date the user contributed within the last `days` days.
+    Fetch the last `max_days` UTC days plus tomorrow (the user's timezone may be ahead)
+    in a single request.
     """
-    query = """
-    query($login: String!) {
-      user(login: $login) {
-        contributionsCollection {
-          contributionCalendar {
-            weeks {
-              contributionDays { date contributionCount }
-            }
-          }
-        }
-      }
-    }"""
-
-    headers = {
-        "Accept": "application/json",
-        "User-Agent": "discord-contrib-bot"
-    }
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
-
-    resp = requests.post(
-        "https://api.github.com/graphql",
-        json={"query": query, "variables": {"login": login}},
-        headers=headers
-    )
-    resp.raise_for_status()
-    data = resp.json()
-    if "errors" in data:
-        raise RuntimeError(f"GitHub GraphQL error: {data['errors']}")
-
-    weeks = data["data"]["user"]["contributionsCollection"]["contributionCalendar"]["weeks"]
-
-    # Compute the last `days` UTC dates
     today = datetime.now(timezone.utc).date()
-    recent_dates = { (today - timedelta(days=i)).isoformat() for i in range(max_days) }
-
-    # Flatten all days and find the latest contribution in the last `days`
-    last_date = None
-    for week in weeks:
-        for day in week["contributionDays"]:
-            if day["date"] in recent_dates and day["contributionCount"] > 0:
-                if not last_date or day["date"] > last_date:
-                    last_date = day["date"]
-
-    return last_date or "No contributions found in the last {} days".format(max_days)
+    return await github_contribution_calendar(
+        login,
+        today - timedelta(days=max_days - 1),
+        today + timedelta(days=1)
+    )
 
 
 # --- DISCORD BOT ---
@@ -129,12 +46,21 @@ async def contribs(ctx, github_username: str):
     """
     Fetch GitHub contributions for yesterday, today, tomorrow (UTC) and last contribution date.
     """
+    max_days = 3
     try:
-        yesterday = github_contribs_on_date(github_username, delta_days=-1)
-        today = github_contribs_on_date(github_username, delta_days=0)
-        tomorrow = github_contribs_on_date(github_username, delta_days=1)
-        last_date = github_last_contrib_date(github_username)
-        
+        calendar = await github_recent_calendar(github_username, max_days)
+        today_utc = datetime.now(timezone.utc).date()
+
+        yesterday = calendar.count_on(today_utc - timedelta(days=1))
+        today = calendar.count_on(today_utc)
+        tomorrow = calendar.count_on(today_utc + timedelta(days=1))
+
+        last = calendar.last_contribution()
+        if last is not None:
+            last_date = last.date.isoformat()
+        else:
+            last_date = "No contributions found in the last {} days".format(max_days)
+
         await ctx.send(
             f"📊 GitHub contributions for **{github_username}** (UTC):\n"
             f"Yesterday: **{yesterday}**\n"
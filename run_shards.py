@@ -0,0 +1,41 @@
+"""
+Run the bot as several processes, each connecting its own share of the shards
+and serving only the guild partitions on those shards.
+
+    python run_shards.py --workers 2 --shards 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+def main(args: argparse.Namespace) -> int:
+    shard_count: int = max(args.shards or args.workers, args.workers)
+
+    processes: list[subprocess.Popen] = []
+    for worker in range(args.workers):
+        shard_ids: list[int] = [shard_id for shard_id in range(shard_count) if shard_id % args.workers == worker]
+        env = dict(
+            os.environ,
+            KODA_SHARD_COUNT=str(shard_count),
+            KODA_SHARD_IDS=",".join(str(shard_id) for shard_id in shard_ids)
+        )
+        print(f"Starting worker {worker} with shards {shard_ids}")
+        processes.append(subprocess.Popen([sys.executable, "bot.py"], env=env))
+
+    try:
+        return max(process.wait() for process in processes)
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--shards", type=int, default=None, help="total shards, defaults to one per worker")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,67 @@
+import asyncio
+import weakref
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+class KeyedLocks:
+    """ One asyncio.Lock per key, so work on the same key runs in order while
+        different keys run concurrently. Locks are only weakly referenced and
+        go away once nobody holds or waits on them, so the registry only ever
+        holds the keys currently in use.
+    """
+
+    def __init__(self):
+        self._locks: weakref.WeakValueDictionary[Hashable, asyncio.Lock] = weakref.WeakValueDictionary()
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def lock(self, key: Hashable) -> asyncio.Lock:
+        """ Use as `async with locks.lock(key):`, holding the lock keeps it registered
+        """
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    @asynccontextmanager
+    async def lock_all(self, keys: Iterable[Hashable]) -> AsyncIterator[None]:
+        """ Hold the locks of every key in `keys`. They are taken in sorted
+            order, so two callers locking overlapping keys never deadlock
+        """
+        async with AsyncExitStack() as stack:
+            for key in sorted(set(keys)):
+                await stack.enter_async_context(self.lock(key))
+            yield
+
+
+class InFlightRequests:
+    """ Callers asking for a key that is already being fetched wait for that
+        fetch instead of starting their own. Every caller gets the same result
+        or exception, and one caller being cancelled doesn't cancel the others.
+    """
+
+    def __init__(self):
+        self._pending: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def run(self, key: Hashable, request: Callable[[], Awaitable[T]]) -> T:
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(request())
+            self._pending[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._pending.get(key) is future:
+            del self._pending[key]
+        # Nobody may be left to see the exception if every caller was cancelled
+        if not future.cancelled():
+            future.exception()
@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from .model import (
+    GithubContributionDay,
+    ContributionCacheStats
+)
+
+
+class ContributionCache:
+    """ LRU cache of each login's latest contribution with a time-to-live.
+        Logins GitHub doesn't know about are cached too (negative entries)
+    """
+
+    MISS = object()
+    NOT_FOUND = object()
+
+    def __init__(self, ttl: float, max_size: int, negative_ttl: float):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        # login -> (expires_at, value), least recently used first
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    @staticmethod
+    def _key(login: str) -> str:
+        # GitHub logins are case-insensitive
+        return login.lower()
+
+    def get(self, login: str) -> Any:
+        """ Cached Optional[GithubContributionDay], NOT_FOUND for unknown logins or MISS
+        """
+        key = self._key(login)
+        entry = self._entries.get(key)
+
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return self.MISS
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, login: str, contribution: Optional[GithubContributionDay]) -> None:
+        self._set(login, contribution, self.ttl)
+
+    def put_not_found(self, login: str) -> None:
+        self._set(login, self.NOT_FOUND, self.negative_ttl)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _set(self, login: str, value: Any, ttl: float) -> None:
+        if self.max_size <= 0 or ttl <= 0:
+            return
+
+        key = self._key(login)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> ContributionCacheStats:
+        return ContributionCacheStats(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            size=len(self._entries)
+        )
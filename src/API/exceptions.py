@@ -1,3 +1,4 @@
+from datetime import timedelta
 
 class NewUserError(RuntimeError):
     def __init__(self, message: str):
@@ -6,4 +7,16 @@ class NewUserError(RuntimeError):
 class LackOfContributionError(RuntimeError):
     def __init__(self, message: str):
         super().__init__(message)
-        
\ No newline at end of file
+        
+class GithubUserNotFoundError(RuntimeError):
+    def __init__(self, message: str):
+        super().__init__(message)
+
+class GithubRateLimitError(RuntimeError):
+    def __init__(self, message: str, retry_after: timedelta):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class PartitionNotOwnedError(RuntimeError):
+    def __init__(self, message: str):
+        super().__init__(message)
@@ -1,65 +1,378 @@
 import os
-from datetime import datetime, date
+import time
+from datetime import datetime, date, timedelta, timezone
 from typing import Optional
 
 from dotenv import load_dotenv
-import requests
+import aiohttp
 
-from .model import GithubContributionDay
+from .model import (
+    GithubContributionDay,
+    ContributionCalendar,
+    GithubSettings,
+    RateLimitState,
+    ContributionCacheStats
+)
+from .contribution_cache import ContributionCache
+from .rate_limit import RateLimitScheduler, RequestPriority
+from .concurrency import InFlightRequests
+from .exceptions import (
+    GithubUserNotFoundError,
+    GithubRateLimitError
+)
+from ..Logging.logger import Logger
 
 
 load_dotenv()
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+# Override to point at a stand-in server, e.g. benchmarks/fake_github.py
+GITHUB_GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL", "https://api.github.com/graphql")
 
+LOGGER = Logger(__file__)
 
-def github_last_contrib(login: str) -> Optional[GithubContributionDay]:
-    """Return the most recent contribution date as a datetime.date object."""
-    query = """
-    query($login: String!) {
-      user(login: $login) {
-        contributionsCollection {
-          contributionCalendar {
-            weeks {
-              contributionDays { date contributionCount }
-            }
-          }
+CONTRIB_WINDOW_QUERY = """
+query($login: String!, $from: DateTime!, $to: DateTime!) {
+  rateLimit { limit cost remaining resetAt }
+  user(login: $login) {
+    contributionsCollection(from: $from, to: $to) {
+      contributionCalendar {
+        weeks {
+          contributionDays { date contributionCount }
         }
       }
-    }"""
-    
-    headers = {
-        "Accept": "application/json",
-        "User-Agent": "discord-contrib-bot"
     }
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
-    
-    resp = requests.post(
-        "https://api.github.com/graphql",
-        json={"query": query, "variables": {"login": login}},
-        headers=headers
+  }
+}"""
+
+CONTRIB_DAYS_FRAGMENT = """
+fragment contributionDays on User {
+  contributionsCollection(from: $from, to: $to) {
+    contributionCalendar {
+      weeks {
+        contributionDays { date contributionCount }
+      }
+    }
+  }
+}"""
+
+
+def _batch_query(size: int) -> str:
+    """ One aliased user(login:) lookup per login, u<i> answering $l<i>
+    """
+    params = ", ".join(f"$l{i}: String!" for i in range(size))
+    lookups = "\n".join(f"  u{i}: user(login: $l{i}) {{ ...contributionDays }}" for i in range(size))
+    return (
+        f"query($from: DateTime!, $to: DateTime!, {params}) {{\n"
+        f"  rateLimit {{ limit cost remaining resetAt }}\n{lookups}\n}}"
+        + CONTRIB_DAYS_FRAGMENT
     )
-    resp.raise_for_status()
-    data = resp.json()
-    if "errors" in data:
-        raise RuntimeError(f"GitHub GraphQL error: {data['errors']}")
-
-    weeks = data["data"]["user"]["contributionsCollection"]["contributionCalendar"]["weeks"]
-    
-    last_date_str = None
-    count: int = 0
-    for week in weeks:
-        for day in week["contributionDays"]:
-            n = day["contributionCount"]
-            if day["contributionCount"] > 0:
-                last_date_str = day["date"]
-                count = n
-    
-    if last_date_str:
-        return GithubContributionDay(
-            date=datetime.strptime(last_date_str, "%Y-%m-%d").date(),
-            count=count
+
+
+def _window_variables(start: date, end: date) -> dict:
+    return {
+        "from": f"{start.isoformat()}T00:00:00Z",
+        "to": f"{end.isoformat()}T23:59:59Z"
+    }
+
+
+def _parse_calendar(user: dict) -> ContributionCalendar:
+    weeks = user["contributionsCollection"]["contributionCalendar"]["weeks"]
+
+    return ContributionCalendar(days=[
+        GithubContributionDay(
+            date=datetime.strptime(day["date"], "%Y-%m-%d").date(),
+            count=day["contributionCount"]
+        )
+        for week in weeks
+        for day in week["contributionDays"]
+    ])
+
+
+class GithubClient:
+    """ Async GitHub GraphQL client sharing one keep-alive connection pool
+    """
+
+    def __init__(self, settings: Optional[GithubSettings] = None, token: Optional[str] = GITHUB_TOKEN):
+        self.settings = settings or GithubSettings(graphql_url=GITHUB_GRAPHQL_URL)
+        self.token = token
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.cache = ContributionCache(
+            ttl=self.settings.cache_ttl,
+            max_size=self.settings.cache_max_size,
+            negative_ttl=self.settings.cache_negative_ttl
+        )
+        self.scheduler = RateLimitScheduler(
+            limit=self.settings.rate_limit,
+            background_reserve=self.settings.background_reserve,
+            interactive_max_wait=self.settings.interactive_max_wait
+        )
+        self._lookups = InFlightRequests() # last_contrib calls waiting on GitHub
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session binds to the running event loop
+        if self._session is None or self._session.closed:
+            headers = {
+                "Accept": "application/json",
+                "User-Agent": "discord-contrib-bot"
+            }
+            if self.token:
+                headers["Authorization"] = f"Bearer {self.token}"
+
+            connector = aiohttp.TCPConnector(
+                limit=self.settings.max_connections,
+                keepalive_timeout=self.settings.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.settings.request_timeout)
+            )
+        return self._session
+
+    async def graphql(
+        self,
+        query: str,
+        variables: dict,
+        priority: RequestPriority = RequestPriority.Interactive
+    ) -> dict:
+        await self.scheduler.acquire(priority)
+
+        session = self._get_session()
+        async with session.post(
+            self.settings.graphql_url,
+            json={"query": query, "variables": variables}
+        ) as resp:
+            self.scheduler.update_from_headers(resp.headers)
+
+            if resp.status in (403, 429) and (
+                resp.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in resp.headers
+            ):
+                self._rate_limited(resp.headers.get("Retry-After"))
+
+            resp.raise_for_status()
+            data = await resp.json()
+
+        rate_limit = (data.get("data") or {}).get("rateLimit")
+        if rate_limit:
+            self.scheduler.update_from_graphql(rate_limit)
+
+        errors = data.get("errors", [])
+        if any(e.get("type") == "RATE_LIMITED" for e in errors):
+            self._rate_limited(None)
+
+        # Unknown logins come back as a null user plus a NOT_FOUND error, callers handle those
+        errors = [e for e in errors if e.get("type") != "NOT_FOUND"]
+        if errors:
+            raise RuntimeError(f"GitHub GraphQL error: {errors}")
+        return data
+
+    def _rate_limited(self, retry_after: Optional[str]) -> None:
+        if retry_after is not None:
+            # Secondary limit, back off for a while but the budget is still there
+            wait = float(retry_after)
+            self.scheduler.pause(wait)
+        else:
+            self.scheduler.exhaust()
+            wait = max(1.0, self.scheduler.reset_at - time.time())
+
+        LOGGER.warn("GitHub rate limit hit, pausing calls for %.0fs", wait)
+        raise GithubRateLimitError(
+            f"GitHub rate limit exhausted, resets in {wait:.0f}s",
+            timedelta(seconds=wait)
+        )
+
+    def rate_limit_state(self) -> RateLimitState:
+        return self.scheduler.state()
+
+    def cache_stats(self) -> ContributionCacheStats:
+        return self.cache.stats()
+
+    async def contribution_calendar(
+        self,
+        login: str,
+        start: date,
+        end: date,
+        priority: RequestPriority = RequestPriority.Interactive
+    ) -> ContributionCalendar:
+        """ Fetch the user's daily contribution counts for start..end inclusive in one request
+        """
+        data = await self.graphql(CONTRIB_WINDOW_QUERY, {
+            "login": login,
+            **_window_variables(start, end)
+        }, priority)
+
+        user = data["data"]["user"]
+        if user is None:
+            self.cache.put_not_found(login)
+            raise GithubUserNotFoundError(f"GitHub user not found: {login}")
+
+        calendar: ContributionCalendar = _parse_calendar(user)
+
+        # A window reaching today holds the user's latest contribution, if it has any
+        latest: Optional[GithubContributionDay] = calendar.last_contribution()
+        if latest is not None and end >= datetime.now(timezone.utc).date():
+            self.cache.put(login, latest)
+
+        return calendar
+
+    def _window(self, since: Optional[date]) -> tuple[date, int]:
+        """ Today (UTC) and how many days back from it to search
+        """
+        today: date = datetime.now(timezone.utc).date()
+
+        if since is not None:
+            window_days = (today - since).days + 1
+        else:
+            window_days = self.settings.default_window_days
+        return today, max(1, min(window_days, self.settings.max_window_days))
+
+    async def last_contrib(
+        self,
+        login: str,
+        since: Optional[date] = None,
+        priority: RequestPriority = RequestPriority.Interactive
+    ) -> Optional[GithubContributionDay]:
+        """ Return the most recent day the user contributed on, or None.
+            Only the days from `since` onwards are requested; the window widens
+            up to max_window_days when nothing is found in it.
+            Results are cached per login for GithubSettings.cache_ttl, and
+            concurrent lookups of the same login share one request.
+        """
+        cached = self.cache.get(login)
+        if cached is ContributionCache.NOT_FOUND:
+            raise GithubUserNotFoundError(f"GitHub user not found: {login}")
+        if cached is not ContributionCache.MISS:
+            return cached
+
+        return await self._lookups.run(
+            (login, since),
+            lambda: self._fetch_last_contrib(login, since, priority)
         )
-    else:
-        return None  # No contributions found
 
+    async def _fetch_last_contrib(
+        self,
+        login: str,
+        since: Optional[date],
+        priority: RequestPriority
+    ) -> Optional[GithubContributionDay]:
+        today, window_days = self._window(since)
+        # Calendar days follow the user's timezone, which may already be tomorrow in UTC
+        end: date = today + timedelta(days=1)
+
+        while True:
+            start: date = today - timedelta(days=window_days - 1)
+            calendar = await self.contribution_calendar(login, start, end, priority)
+            latest: Optional[GithubContributionDay] = calendar.last_contribution()
+
+            if latest is not None or window_days >= self.settings.max_window_days:
+                self.cache.put(login, latest)
+                return latest
+
+            LOGGER.debug("No contributions for %s in the last %s days, widening window", login, window_days)
+            window_days = min(window_days * 4, self.settings.max_window_days)
+
+    async def last_contribs(
+        self,
+        logins: list[str],
+        since: Optional[date] = None,
+        priority: RequestPriority = RequestPriority.Background
+    ) -> dict[str, Optional[GithubContributionDay]]:
+        """ Batched last_contrib: many logins per GraphQL request, chunked by
+            GithubSettings.batch_size. Unknown logins map to None.
+        """
+        results: dict[str, Optional[GithubContributionDay]] = {}
+        pending: list[str] = []
+
+        for login in dict.fromkeys(logins):
+            cached = self.cache.get(login)
+            if cached is ContributionCache.NOT_FOUND:
+                results[login] = None
+            elif cached is not ContributionCache.MISS:
+                results[login] = cached
+            else:
+                pending.append(login)
+
+        today, window_days = self._window(since)
+        end: date = today + timedelta(days=1)
+
+        while pending:
+            start: date = today - timedelta(days=window_days - 1)
+            empty: list[str] = []
+
+            for i in range(0, len(pending), self.settings.batch_size):
+                chunk = pending[i:i + self.settings.batch_size]
+                found = await self._fetch_batch(chunk, start, end, priority)
+
+                for login in chunk:
+                    if login not in found:
+                        self.cache.put_not_found(login)
+                        results[login] = None
+                    elif found[login] is None and window_days < self.settings.max_window_days:
+                        empty.append(login)
+                    else:
+                        self.cache.put(login, found[login])
+                        results[login] = found[login]
+
+            if empty:
+                LOGGER.debug("No contributions for %s users in the last %s days, widening window", len(empty), window_days)
+            pending = empty
+            window_days = min(window_days * 4, self.settings.max_window_days)
+
+        return results
+
+    async def _fetch_batch(
+        self,
+        logins: list[str],
+        start: date,
+        end: date,
+        priority: RequestPriority
+    ) -> dict[str, Optional[GithubContributionDay]]:
+        """ Latest contribution in start..end for each login GitHub knows about
+        """
+        variables = _window_variables(start, end)
+        for i, login in enumerate(logins):
+            variables[f"l{i}"] = login
+
+        data = await self.graphql(_batch_query(len(logins)), variables, priority)
+
+        found: dict[str, Optional[GithubContributionDay]] = {}
+        for i, login in enumerate(logins):
+            user = data["data"].get(f"u{i}")
+            if user is not None:
+                found[login] = _parse_calendar(user).last_contribution()
+        return found
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            LOGGER.debug("Closed GitHub client session")
+        self._session = None
+
+
+_default_client: Optional[GithubClient] = None
+
+def get_github_client() -> GithubClient:
+    """ Shared client for callers that don't manage their own
+    """
+    global _default_client
+    if _default_client is None:
+        _default_client = GithubClient()
+    return _default_client
+
+
+async def github_last_contrib(login: str, since: Optional[date] = None) -> Optional[GithubContributionDay]:
+    """Return the most recent contribution day for the user."""
+    return await get_github_client().last_contrib(login, since)
+
+
+async def github_contribution_calendar(login: str, start: date, end: date) -> ContributionCalendar:
+    """Return the user's contribution days for start..end inclusive."""
+    return await get_github_client().contribution_calendar(login, start, end)
+
+
+async def github_last_contribs(
+    logins: list[str],
+    since: Optional[date] = None
+) -> dict[str, Optional[GithubContributionDay]]:
+    """Return the most recent contribution day for each user, one request per batch."""
+    return await get_github_client().last_contribs(logins, since)
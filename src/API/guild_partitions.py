@@ -0,0 +1,190 @@
+import asyncio
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional, TextIO
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from ..Logging.logger import Logger
+from ..Database.model import DatabaseSettings, SaveReport
+from .koda import Koda
+from .model import ShardSettings
+from .exceptions import PartitionNotOwnedError
+
+LOGGER = Logger(__file__)
+
+
+class GuildPartitions:
+    """ One Koda per guild, each over its own store, ranking and snapshot
+        files in a folder of its own, so stats and leaderboards are per guild
+        and a big guild's saves never touch a small guild's files.
+        Loads and saves run the partitions concurrently.
+
+        When the bot runs as several processes each one only opens the
+        partitions of guilds on its own shards, and holds a lock on them,
+        so every partition has a single writer.
+    """
+
+    DIRECT_MESSAGES = "direct" # partition for commands sent outside a guild
+    LOCK_FILENAME = "partition.lock"
+
+    def __init__(
+        self,
+        database_settings: DatabaseSettings,
+        create_koda: Callable[[DatabaseSettings], Koda],
+        max_workers: int = 4,
+        shard_settings: ShardSettings = ShardSettings()
+    ):
+        self.database_settings = database_settings
+        self.create_koda = create_koda
+        self.max_workers = max_workers
+        self.shard_settings = shard_settings
+        self.root_folder = Path(database_settings.save_folder) / database_settings.partition_folder
+        self.partitions: dict[str, Koda] = {}
+        self._save_slots = asyncio.Semaphore(max_workers)
+        self._locks: dict[str, TextIO] = {}
+
+    def settings_for(self, key: str) -> DatabaseSettings:
+        return self.database_settings.model_copy(update={'save_folder': str(self.root_folder / key)})
+
+    def load_all(self) -> int:
+        """ Load every partition on disk that this process owns in a worker pool,
+            returns how many were loaded
+        """
+        if not self.root_folder.exists():
+            return 0
+
+        keys: list[str] = sorted(
+            path.name for path in self.root_folder.iterdir()
+            if path.is_dir() and self._is_partition_key(path.name) and self.owns(path.name)
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="partition-load") as pool:
+            kodas: list[Koda] = list(pool.map(self._open, keys))
+
+        self.partitions.update(zip(keys, kodas))
+        LOGGER.info("Loaded %s guild partitions", len(keys))
+        return len(keys)
+
+    def has_legacy_store(self) -> bool:
+        """ True if save_folder still holds a store from before partitioning
+        """
+        return bool(self._legacy_entries())
+
+    def adopt_legacy_store(self, guild_id: int) -> bool:
+        """ Move a store from before partitioning, kept directly in save_folder,
+            into `guild_id`'s partition. Does nothing once that partition exists
+        """
+        target: Path = self.root_folder / self.partition_key(guild_id)
+        if not self.shard_settings.owns_guild(guild_id) or target.exists():
+            return False
+
+        entries: list[Path] = self._legacy_entries()
+        if not entries:
+            return False
+
+        target.mkdir(parents=True)
+        for path in entries:
+            shutil.move(str(path), str(target / path.name))
+        LOGGER.info("Moved %s legacy store files into partition %s", len(entries), target.name)
+        return True
+
+    def _legacy_entries(self) -> list[Path]:
+        legacy_folder = Path(self.database_settings.save_folder)
+        if not legacy_folder.exists():
+            return []
+        return [path for path in legacy_folder.iterdir() if path != self.root_folder]
+
+    @classmethod
+    def partition_key(cls, guild_id: Optional[int]) -> str:
+        return str(guild_id) if guild_id is not None else cls.DIRECT_MESSAGES
+
+    @classmethod
+    def _is_partition_key(cls, key: str) -> bool:
+        return key == cls.DIRECT_MESSAGES or key.isdigit()
+
+    def owns(self, key: str) -> bool:
+        return self.shard_settings.owns_guild(None if key == self.DIRECT_MESSAGES else int(key))
+
+    def get(self, guild_id: Optional[int]) -> Koda:
+        """ The partition for `guild_id`, created empty the first time a guild is seen
+        """
+        key: str = self.partition_key(guild_id)
+        koda: Optional[Koda] = self.partitions.get(key)
+        if koda is None:
+            if not self.owns(key):
+                raise PartitionNotOwnedError(f"Guild partition {key} belongs to another shard")
+            LOGGER.info("Creating guild partition: %s", key)
+            koda = self._open(key)
+            self.partitions[key] = koda
+        return koda
+
+    def _open(self, key: str) -> Koda:
+        self._claim(key)
+        try:
+            return self.create_koda(self.settings_for(key))
+        except Exception:
+            self._release(key)
+            raise
+
+    def _claim(self, key: str) -> None:
+        """ Lock the partition's folder for this process, overlapping shard
+            assignments fail here instead of writing the same files twice
+        """
+        if fcntl is None:
+            return
+
+        folder: Path = self.root_folder / key
+        folder.mkdir(parents=True, exist_ok=True)
+        lock_file: TextIO = open(folder / self.LOCK_FILENAME, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise PartitionNotOwnedError(f"Guild partition {key} is held by another process")
+        self._locks[key] = lock_file
+
+    def _release(self, key: str) -> None:
+        lock_file: Optional[TextIO] = self._locks.pop(key, None)
+        if lock_file is not None:
+            lock_file.close()
+
+    async def save_all(self, permanent: bool = False) -> dict[str, SaveReport]:
+        """ Save partitions concurrently, at most max_workers at a time.
+            Permanent saves cover every partition, the others only ones with changes
+        """
+        keys: list[str] = [
+            key for key, koda in self.partitions.items()
+            if permanent or koda.database_facade.has_unsaved_changes()
+        ]
+        results: list = await asyncio.gather(*(self._save(key, permanent) for key in keys), return_exceptions=True)
+
+        # One partition failing to save doesn't stop the others
+        reports: dict[str, SaveReport] = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                LOGGER.error("Failed to save guild partition %s: %r", key, result)
+            else:
+                reports[key] = result
+        LOGGER.info("Saved %s of %s guild partitions", len(reports), len(self.partitions))
+        return reports
+
+    async def _save(self, key: str, permanent: bool) -> SaveReport:
+        async with self._save_slots:
+            return await self.partitions[key].save_db(permanent)
+
+    async def close(self) -> None:
+        """ Close every partition's store and release its folder, one failing doesn't stop the others
+        """
+        for key, koda in self.partitions.items():
+            try:
+                await koda.close()
+            except Exception as e:
+                LOGGER.error("Failed to close guild partition %s: %r", key, e)
+        self.partitions.clear()
+
+        for key in list(self._locks):
+            self._release(key)
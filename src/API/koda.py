@@ -1,9 +1,10 @@
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 from typing import Optional
 
 from ..Logging.logger import Logger
 from ..Database.database_facade import DatabaseFacade
+from ..Database.model import SaveReport
 from .model import (
     Stats,
     User,
@@ -11,15 +12,23 @@ from .model import (
     CheckinSettings,
     LevelingSettings,
     ProofType,
-    GithubContributionDay
+    GithubContributionDay,
+    RateLimitState,
+    ContributionCacheStats,
+    CheckinHistoryPage,
+    CheckinResult,
+    LeaderboardEntry,
+    XpGrantResult
 )
 from .exceptions import (
     NewUserError,
     LackOfContributionError
 )
-from .github import github_last_contrib
+from .github import GithubClient
+from .user_cache import KnownUserCache
+from .concurrency import KeyedLocks
 
-LOGGER = Logger(__file__, "debug")
+LOGGER = Logger(__file__)
 
 class Koda:
 
@@ -29,6 +38,8 @@ class Koda:
         database_facade: DatabaseFacade, 
         checkin_settings: CheckinSettings,
         leveling_settings: LevelingSettings,
+        github_client: Optional[GithubClient] = None,
+        user_cache_size: int = 10000
     ):
         if not os.path.exists(templates_dir_path):
             raise NotADirectoryError(f"Couldn't find Koda templates: {templates_dir_path}")
@@ -37,12 +48,18 @@ class Koda:
         self.leveling_settings = leveling_settings
         self.templates = self.load_templates(templates_dir_path)
         self.database_facade = database_facade
-        self.user_cache = set()
+        self.github_client = github_client or GithubClient()
+        self.user_cache = KnownUserCache(user_cache_size)
+        # Commands that read a user's record, await, then write it back run one at a time per user
+        self.user_locks = KeyedLocks()
 
         if self.database_facade.load_db():
             LOGGER.info("Successfully loaded DB")
+            warmed: int = self.user_cache.warm(self.database_facade.get_user_ids())
+            LOGGER.info("Warmed user cache with %s users", warmed)
 
-    def load_templates(self, templates_dir_path: str) -> dict[str, str]:
+    @staticmethod
+    def load_templates(templates_dir_path: str) -> dict[str, str]:
         file_contents = {}
 
         # Iterate over all items in the directory
@@ -60,91 +77,165 @@ class Koda:
     def get_help_text(self) -> str:
         return self.templates['help.txt']
     
-    def get_stats(self, user_id: str) -> Stats:
-        if self.new_user_detected(user_id):
+    async def get_stats(self, user_id: str) -> Stats:
+        if await self.new_user_detected(user_id):
             raise NewUserError(f"New user detected: {user_id}")
 
-        stats: Stats = self.database_facade.get_stats(user_id)
+        stats: Stats = await self.database_facade.get_stats(user_id)
         
-        LOGGER.debug(f"Retrieved stats from db: {stats.model_dump_json()}")
+        if LOGGER.is_enabled_for("debug"):
+            LOGGER.debug("Retrieved stats from db: %s", stats.model_dump_json())
         return stats
     
-    def new_user_detected(self, user_id: str) -> bool:
-        """ True if user was not in the cache
+    async def new_user_detected(self, user_id: str) -> bool:
+        """ True if the user has no records yet
         """
-        if user_id not in self.user_cache:
-            LOGGER.debug(f"User was not in cache: {user_id}")
-            return True
-        
-        return False
+        if user_id in self.user_cache:
+            return False
+
+        # Only users evicted from a full cache get here and still exist
+        if await self.database_facade.has_user(user_id):
+            self.user_cache.add(user_id)
+            return False
+
+        LOGGER.debug("User was not in cache: %s", user_id)
+        return True
     
-    def establish_new_user(self, user: User) -> None:
+    async def establish_new_user(self, user: User) -> None:
         """ Data may exist but user was not cached so create data where necessary to avoid missing records
         """
+        await self.database_facade.create_missing_user_data(user)
         self.user_cache.add(user.id)
-        self.database_facade.create_missing_user_data(user)
 
-    def checkin(self, user_id: str, checkin: Checkin) -> Optional[timedelta]:
-        if self.new_user_detected(user_id):
+    async def checkin(self, user_id: str, checkin: Checkin) -> CheckinResult:
+        if await self.new_user_detected(user_id):
             raise NewUserError(f"New user detected: {user_id}")
-        
-        #get user
-        user: User = self.database_facade.get_user(user_id)
 
-        if user.last_checkin is not None:
-            # last_checkin_dict: dict = self.database.get_record('checkins', user.last_checkin)
-            # last_checkin: Checkin = Checkin.model_validate(last_checkin_dict)
-
-            if self._checkin_is_too_soon(user.last_checkin, checkin.date):
-                # TODO: allow premature checkins that dont give xp to be logged to history
-                # EDIT: Im not sure allowing premature checkins is necessary, could lead to spam
-                LOGGER.debug(f"User {user_id} attempted to checkin early")
-                return self.checkin_settings.base_cooldown - (checkin.date - user.last_checkin.date)
-        
-        # Handle case where user intends to use github contribution as proof
-        if (user.github_name is not None) and (checkin.proof == user.github_name):
+        # A second checkin waits for the first, then sees its cooldown
+        async with self.user_locks.lock(user_id):
+            return await self._checkin(user_id, checkin)
+
+    async def _checkin(self, user_id: str, checkin: Checkin) -> CheckinResult:
+        # The checkin, the user's last checkin and the XP reward are committed together
+        async with self.database_facade.transaction(user_id) as unit_of_work:
+            user: User = await unit_of_work.get_user(user_id)
+
+            if user.last_checkin is not None:
+                # last_checkin_dict: dict = self.database.get_record('checkins', user.last_checkin)
+                # last_checkin: Checkin = Checkin.model_validate(last_checkin_dict)
+
+                if self._checkin_is_too_soon(user.last_checkin, checkin.date):
+                    # TODO: allow premature checkins that dont give xp to be logged to history
+                    # EDIT: Im not sure allowing premature checkins is necessary, could lead to spam
+                    LOGGER.debug("User %s attempted to checkin early", user_id)
+                    return CheckinResult(
+                        cooldown=self.checkin_settings.base_cooldown - (checkin.date - user.last_checkin.date)
+                    )
 
-            latest_contribution: Optional[GithubContributionDay] = github_last_contrib(user.github_name)
+            # Handle case where user intends to use github contribution as proof
+            if (user.github_name is not None) and (checkin.proof == user.github_name):
 
-            if latest_contribution is not None:
+                latest_contribution: Optional[GithubContributionDay] = await self.github_client.last_contrib(
+                    user.github_name,
+                    since=self._contribution_window_start(user)
+                )
 
-                if user.last_github_contribution is None or (latest_contribution.date != user.last_github_contribution.date):
-                    LOGGER.debug(f"User {user_id} contributed on a new day")
+                if latest_contribution is not None:
 
-                elif latest_contribution.count > user.last_github_contribution.count:
-                    LOGGER.debug(f"User {user_id} contributed again on same day")
+                    if user.last_github_contribution is None or (latest_contribution.date != user.last_github_contribution.date):
+                        LOGGER.debug("User %s contributed on a new day", user_id)
 
+                    elif latest_contribution.count > user.last_github_contribution.count:
+                        LOGGER.debug("User %s contributed again on same day", user_id)
+
+                    else:
+                        raise LackOfContributionError("Did not recognize a new contribution!")
+
+                    checkin.proof_type = ProofType.Contribution
+                    user.last_github_contribution = latest_contribution
+
+            # create new checkin
+            if not checkin.proof_type:
+                if checkin.proof:
+                    checkin.proof_type = ProofType.Note
                 else:
-                    raise LackOfContributionError("Did not recognize a new contribution!")
-                
-                checkin.proof_type = ProofType.Contribution
-                user.last_github_contribution = latest_contribution
-
-        # create new checkin
-        if not checkin.proof_type:
-            if checkin.proof:
-                checkin.proof_type = ProofType.Note
-            else:
-                checkin.proof_type = ProofType.No_proof
-                
-        new_checkin_id: str = self.database_facade.create_checkin(checkin)
-
-        # update last checkin
-        self.database_facade.update_users_last_checkin(user, new_checkin_id, checkin)
-        return None # no cooldown remaining
+                    checkin.proof_type = ProofType.No_proof
+
+            new_checkin_id: str = unit_of_work.add_checkin(checkin)
+
+            # update last checkin
+            user.last_checkin_id = new_checkin_id
+            user.last_checkin = checkin
+            unit_of_work.put('users', user_id, user)
+
+            xp_reward: int = self.leveling_settings.checkin_reward
+            leveled_up: bool = await unit_of_work.give_xp(user_id, xp_reward)
+
+        LOGGER.info("User %s checked in: %s", user_id, new_checkin_id)
+        return CheckinResult(xp_awarded=xp_reward, leveled_up=leveled_up)
+
+    async def get_checkin_history(self, user_id: str, page: int, page_size: int = 10) -> CheckinHistoryPage:
+        if await self.new_user_detected(user_id):
+            raise NewUserError(f"New user detected: {user_id}")
+
+        return await self.database_facade.get_checkin_history(user_id, page, page_size)
+
+    def get_leaderboard(self, n: int) -> list[LeaderboardEntry]:
+        return self.database_facade.get_leaderboard(n)
+
+    async def get_rank(self, user_id: str) -> Optional[LeaderboardEntry]:
+        if await self.new_user_detected(user_id):
+            raise NewUserError(f"New user detected: {user_id}")
+
+        return self.database_facade.get_rank(user_id)
+
+    def _contribution_window_start(self, user: User) -> Optional[date]:
+        """ Nothing older than what we already credited can count as a new contribution
+        """
+        if user.last_github_contribution is not None:
+            return user.last_github_contribution.date
+        if user.last_checkin is not None:
+            return user.last_checkin.date.date()
+        return None
 
     def _checkin_is_too_soon(self, last_checkin: Checkin, new_checkin_time: datetime) -> bool:
         """ Checkins have a cooldown to prevent spamming for XP GAINZ!!!
         """
         difference: timedelta = new_checkin_time - last_checkin.date
-        LOGGER.debug(f"Checkin time difference: {difference}")
+        LOGGER.debug("Checkin time difference: %s", difference)
         return difference < self.checkin_settings.base_cooldown
     
-    def give_xp(self, user_id: str, amount: int) -> bool:
-        return self.database_facade.give_xp(user_id, amount)
+    async def give_xp(self, user_id: str, amount: int) -> bool:
+        # A checkin waiting on GitHub would otherwise write back its stats over the grant
+        async with self.user_locks.lock(user_id):
+            return await self.database_facade.give_xp(user_id, amount)
+
+    async def give_xp_bulk(self, grants: dict[str, int]) -> list[XpGrantResult]:
+        """ Apply every grant in a single commit
+        """
+        for user_id in grants:
+            if await self.new_user_detected(user_id):
+                raise NewUserError(f"New user detected: {user_id}")
+
+        async with self.user_locks.lock_all(grants):
+            return await self.database_facade.give_xp_bulk(grants)
 
-    def register_github_name(self, user_id: str, github_name: str) -> None:
-        self.database_facade.update_users_github_name(user_id, github_name)
+    async def register_github_name(self, user_id: str, github_name: str) -> None:
+        # A checkin waiting on GitHub would otherwise write back the old name
+        async with self.user_locks.lock(user_id):
+            await self.database_facade.update_users_github_name(user_id, github_name)
 
-    def save_db(self, permanent: bool = False) -> None:
-        self.database_facade.save_db(permanent)
+    async def save_db(self, permanent: bool = False) -> SaveReport:
+        return await self.database_facade.save_db(permanent)
+
+    def get_github_rate_limit(self) -> RateLimitState:
+        return self.github_client.rate_limit_state()
+
+    def get_github_cache_stats(self) -> ContributionCacheStats:
+        return self.github_client.cache_stats()
+
+    async def close(self) -> None:
+        """ Close the store, then the GitHub client. Closing a shared client twice is harmless
+        """
+        await self.database_facade.close()
+        await self.github_client.close()
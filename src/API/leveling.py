@@ -0,0 +1,53 @@
+from bisect import bisect_right
+from typing import Callable
+
+from .model import LevelingSettings
+
+
+class LevelCurve:
+    """ Cumulative XP needed to reach each level, extended as higher levels
+        come up. A grant of any size resolves to its final level with one bisect.
+    """
+
+    MAX_GRANT = 10_000_000 # bounds how far one grant can extend the table, ~level 200 on the default curve
+
+    def __init__(self, xp_to_next_level: Callable[[int], int] = LevelingSettings.xp_to_next_level):
+        self.xp_to_next_level = xp_to_next_level
+        # _thresholds[i] = total xp needed to go from level 1 to level i + 1
+        self._thresholds: list[int] = [0]
+
+    def threshold(self, level: int) -> int:
+        """ Total xp needed to go from level 1 to `level`
+        """
+        self._extend_to_level(level)
+        return self._thresholds[level - 1]
+
+    def apply(self, level: int, xp: int, amount: int) -> tuple[int, int]:
+        """ (level, xp into that level) after granting `amount`, overflow carries over
+        """
+        if not 0 <= amount <= self.MAX_GRANT:
+            raise ValueError(f"Xp grants must be between 0 and {self.MAX_GRANT}, got {amount}")
+
+        total: int = self.threshold(level) + xp + amount
+        self._extend_to_total(total)
+        new_level: int = bisect_right(self._thresholds, total)
+        return new_level, total - self._thresholds[new_level - 1]
+
+    def _extend_to_level(self, level: int) -> None:
+        while len(self._thresholds) < level:
+            self._append_next()
+
+    def _extend_to_total(self, total: int) -> None:
+        # Keep one threshold above total, so bisect never lands on the last level by default
+        while self._thresholds[-1] <= total:
+            self._append_next()
+
+    def _append_next(self) -> None:
+        level: int = len(self._thresholds)
+        needed: int = self.xp_to_next_level(level)
+        if needed <= 0:
+            raise ValueError(f"Level {level} must need a positive amount of xp, got {needed}")
+        self._thresholds.append(self._thresholds[-1] + needed)
+
+
+DEFAULT_LEVEL_CURVE = LevelCurve()
@@ -1,8 +1,9 @@
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta, date
 from typing import Optional
 from enum import Enum
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 
 class Stats(BaseModel):
@@ -21,10 +22,81 @@ class Checkin(BaseModel):
     proof: str
     proof_type: Optional[ProofType] = None
 
+class CheckinResult(BaseModel):
+    cooldown: Optional[timedelta] = None # set when the checkin came too soon and nothing was recorded
+    xp_awarded: int = 0
+    leveled_up: bool = False
+
+class XpGrantResult(BaseModel):
+    user_id: str
+    amount: int
+    level: int # after the grant
+    xp: int
+    leveled_up: bool
+
+class LeaderboardEntry(BaseModel):
+    rank: int # 1 is the top, users with the same level and xp share a rank
+    user_id: str
+    level: int
+    xp: int
+
+class CheckinHistoryPage(BaseModel):
+    checkins: list[Checkin] # newest first
+    page: int
+    total_pages: int
+    total_checkins: int
+
 class GithubContributionDay(BaseModel):
     date: date
     count: int
 
+class ContributionCalendar(BaseModel):
+    """ A fetched window of a user's contribution days, indexed by date
+    """
+    days: list[GithubContributionDay] = []
+
+    _dates: list[date] = PrivateAttr(default_factory=list)
+    _index: dict[date, int] = PrivateAttr(default_factory=dict)
+    _prefix_sums: list[int] = PrivateAttr(default_factory=list) # _prefix_sums[i] = counts of days[:i]
+    _last_contribution: Optional[GithubContributionDay] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context) -> None:
+        self.days.sort(key=lambda day: day.date)
+
+        self._dates = [day.date for day in self.days]
+        self._index = {day.date: day.count for day in self.days}
+
+        total: int = 0
+        self._prefix_sums = [0]
+        for day in self.days:
+            total += day.count
+            self._prefix_sums.append(total)
+            if day.count > 0:
+                self._last_contribution = day
+
+    @property
+    def start(self) -> Optional[date]:
+        return self._dates[0] if self._dates else None
+
+    @property
+    def end(self) -> Optional[date]:
+        return self._dates[-1] if self._dates else None
+
+    def count_on(self, day: date) -> int:
+        return self._index.get(day, 0)
+
+    def last_contribution(self) -> Optional[GithubContributionDay]:
+        return self._last_contribution
+
+    def total_between(self, start: date, end: date) -> int:
+        """ Contributions from start to end inclusive
+        """
+        lo = bisect_left(self._dates, start)
+        hi = bisect_right(self._dates, end)
+        if hi <= lo:
+            return 0
+        return self._prefix_sums[hi] - self._prefix_sums[lo]
+
 class User(BaseModel):
     id: str
     last_checkin_id: Optional[str] = None
@@ -41,3 +113,57 @@ class LevelingSettings(BaseModel):
     @staticmethod
     def xp_to_next_level(current_level: int) -> int:
         return current_level * 500
+
+class ShardSettings(BaseModel):
+    shard_count: int = 1
+    shard_ids: Optional[list[int]] = None # shards run by this process, all of them when None
+
+    def shard_for_guild(self, guild_id: Optional[int]) -> int:
+        """ The shard Discord delivers the guild's events to, direct messages go to shard 0
+        """
+        if guild_id is None:
+            return 0
+        return (guild_id >> 22) % self.shard_count
+
+    def owns_guild(self, guild_id: Optional[int]) -> bool:
+        return self.shard_ids is None or self.shard_for_guild(guild_id) in self.shard_ids
+
+class GithubSettings(BaseModel):
+    graphql_url: str = "https://api.github.com/graphql"
+    request_timeout: float = 10.0 # seconds, per request
+    max_connections: int = 10
+    keepalive_timeout: float = 30.0 # seconds an idle connection is kept open
+    default_window_days: int = 7 # lookback when a user has no contribution/checkin history
+    max_window_days: int = 360 # GitHub rejects ranges spanning more than a year
+    cache_ttl: float = 60.0 # seconds a looked up contribution is reused
+    cache_max_size: int = 1024 # logins kept before least recently used are evicted
+    cache_negative_ttl: float = 600.0 # seconds an unknown login is remembered
+    batch_size: int = 25 # logins per batched query, keeps each request well under GitHub's node limit
+    rate_limit: int = 5000 # points per hour until GitHub reports the real budget
+    background_reserve: int = 500 # points background work leaves for interactive checkins
+    interactive_max_wait: float = 5.0 # seconds a checkin waits for budget before giving up
+
+class RateLimitState(BaseModel):
+    limit: int
+    remaining: int
+    reset_at: Optional[datetime]
+    paused_until: Optional[datetime] # set while backing off after a Retry-After
+    last_cost: int
+    queued_interactive: int
+    queued_background: int
+
+class DispatcherSettings(BaseModel):
+    level_up_window: float = 3.0 # seconds level-ups are collected into one announcement
+
+class DispatcherState(BaseModel):
+    queued_replies: int
+    queued_announcements: int
+    pending_level_ups: int # waiting for their announcement window to close
+    busiest_channel_id: Optional[int]
+    busiest_channel_depth: int
+
+class ContributionCacheStats(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
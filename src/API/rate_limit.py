@@ -0,0 +1,196 @@
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime, timedelta, timezone
+from enum import IntEnum
+from typing import Mapping, Optional
+
+from .model import RateLimitState
+from .exceptions import GithubRateLimitError
+from ..Logging.logger import Logger
+
+LOGGER = Logger(__file__)
+
+
+class RequestPriority(IntEnum):
+    # Lower value is served first
+    Interactive = 0
+    Background = 1
+
+
+class RateLimitScheduler:
+    """ Token bucket mirroring GitHub's rate limit budget.
+        The bucket is refilled from response headers and the GraphQL rateLimit
+        object, and at the reset time. Calls wait in priority order while the
+        budget is exhausted, or while GitHub asked us to back off with a
+        Retry-After, which pauses calls without touching the budget.
+        Background calls also leave `background_reserve` points untouched so
+        interactive checkins can still get through.
+    """
+
+    def __init__(
+        self,
+        limit: int = 5000,
+        background_reserve: int = 0,
+        interactive_max_wait: float = 0.0
+    ):
+        self.limit = limit
+        self.remaining = limit
+        self.reset_at: float = 0.0 # epoch seconds, 0 until GitHub tells us
+        self.paused_until: float = 0.0 # epoch seconds, set by a Retry-After
+        self.last_cost: int = 0
+        self.background_reserve = background_reserve
+        self.interactive_max_wait = interactive_max_wait
+
+        self._waiters: list[tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    async def acquire(self, priority: RequestPriority, cost: int = 1) -> None:
+        """ Wait until `cost` points can be spent on a call of this priority.
+            Interactive calls give up with GithubRateLimitError after interactive_max_wait.
+        """
+        self._refill()
+        if not self._queued_ahead_of(priority) and not self._is_paused() and self._affordable(priority, cost):
+            self.remaining -= cost
+            return
+
+        if priority == RequestPriority.Interactive and self._seconds_until_available(priority, cost) > self.interactive_max_wait:
+            raise self._limit_error(self._seconds_until_available(priority, cost))
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), cost, future))
+        LOGGER.debug("Queued %s GitHub call, %s waiting", priority.name, len(self._waiters))
+        self._schedule_wakeup()
+
+        timeout: Optional[float] = None
+        if priority == RequestPriority.Interactive:
+            timeout = self.interactive_max_wait
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise self._limit_error(self._seconds_until_available(priority, cost))
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        if "X-RateLimit-Remaining" not in headers:
+            return
+
+        if "X-RateLimit-Limit" in headers:
+            self.limit = int(headers["X-RateLimit-Limit"])
+        reset_at = float(headers["X-RateLimit-Reset"]) if "X-RateLimit-Reset" in headers else None
+        self._observe(int(headers["X-RateLimit-Remaining"]), reset_at)
+
+    def update_from_graphql(self, rate_limit: dict) -> None:
+        """ Apply a GraphQL `rateLimit { limit cost remaining resetAt }` object
+        """
+        self.last_cost = rate_limit.get("cost", self.last_cost)
+        self.limit = rate_limit.get("limit", self.limit)
+        reset_at: Optional[float] = None
+        if rate_limit.get("resetAt"):
+            reset_at = datetime.fromisoformat(rate_limit["resetAt"].replace("Z", "+00:00")).timestamp()
+        if "remaining" in rate_limit:
+            self._observe(rate_limit["remaining"], reset_at)
+
+    def _observe(self, remaining: int, reset_at: Optional[float]) -> None:
+        """ A response reports what was left when GitHub answered it. Calls granted
+            since then are still in flight, so within the same window we keep the
+            lower of the two figures.
+        """
+        if reset_at is not None and int(reset_at) != int(self.reset_at):
+            self.reset_at = reset_at
+            self.remaining = remaining
+        else:
+            self.remaining = min(self.remaining, remaining)
+        self._dispatch()
+
+    def exhaust(self, fallback_wait: float = 60.0) -> None:
+        """ GitHub says the budget is spent, nothing more goes out until the reset.
+            Without a known reset time, assume one `fallback_wait` from now
+        """
+        self.remaining = 0
+        if self.reset_at <= time.time():
+            self.reset_at = time.time() + fallback_wait
+        self._schedule_wakeup()
+
+    def pause(self, retry_after: float) -> None:
+        """ GitHub asked us to back off (secondary rate limit), no call goes out
+            for `retry_after` seconds but the budget is left as it is
+        """
+        self.paused_until = max(self.paused_until, time.time() + retry_after)
+        self._schedule_wakeup()
+
+    def state(self) -> RateLimitState:
+        self._refill()
+        return RateLimitState(
+            limit=self.limit,
+            remaining=self.remaining,
+            reset_at=datetime.fromtimestamp(self.reset_at, timezone.utc) if self.reset_at else None,
+            paused_until=datetime.fromtimestamp(self.paused_until, timezone.utc) if self._is_paused() else None,
+            last_cost=self.last_cost,
+            queued_interactive=sum(1 for w in self._waiters if w[0] == RequestPriority.Interactive and not w[3].done()),
+            queued_background=sum(1 for w in self._waiters if w[0] == RequestPriority.Background and not w[3].done())
+        )
+
+    def _queued_ahead_of(self, priority: RequestPriority) -> bool:
+        return any(w[0] <= priority and not w[3].done() for w in self._waiters)
+
+    def _limit_error(self, wait: float) -> GithubRateLimitError:
+        return GithubRateLimitError(
+            f"GitHub rate limit exhausted, resets in {wait:.0f}s",
+            timedelta(seconds=wait)
+        )
+
+    def _affordable(self, priority: RequestPriority, cost: int) -> bool:
+        reserve = self.background_reserve if priority == RequestPriority.Background else 0
+        return self.remaining - cost >= reserve
+
+    def _seconds_until_reset(self) -> float:
+        return max(0.0, self.reset_at - time.time())
+
+    def _is_paused(self) -> bool:
+        return time.time() < self.paused_until
+
+    def _seconds_until_available(self, priority: RequestPriority, cost: int) -> float:
+        wait: float = max(0.0, self.paused_until - time.time())
+        if not self._affordable(priority, cost):
+            wait = max(wait, self._seconds_until_reset())
+        return wait
+
+    def _refill(self) -> None:
+        if self.reset_at and time.time() >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = 0.0
+
+    def _dispatch(self) -> None:
+        """ Grant queued calls in priority order for as long as the budget allows
+        """
+        self._refill()
+        while self._waiters and not self._is_paused():
+            priority, _, cost, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._affordable(RequestPriority(priority), cost):
+                break
+
+            heapq.heappop(self._waiters)
+            self.remaining -= cost
+            future.set_result(None)
+
+        self._schedule_wakeup()
+
+    def _schedule_wakeup(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        if self._waiters:
+            if self._is_paused():
+                delay = self.paused_until - time.time()
+            elif self.reset_at:
+                delay = self._seconds_until_reset()
+            else:
+                # Without a known reset time, poll until a response tells us more
+                delay = 1.0
+            self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
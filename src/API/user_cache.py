@@ -0,0 +1,41 @@
+from collections import OrderedDict
+from typing import Iterable
+
+
+class KnownUserCache:
+    """ Bounded set of user ids known to have their records in the store.
+        Once full the oldest entries are dropped, a dropped user is simply
+        looked up in the store again. Users are never deleted from the store,
+        so an entry can't go stale.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # Oldest first. Ids come from the store, so the strings themselves are shared with it
+        self._ids: OrderedDict[str, None] = OrderedDict()
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, user_id: str) -> None:
+        if self.max_size <= 0 or user_id in self._ids:
+            return
+
+        if len(self._ids) >= self.max_size:
+            self._ids.popitem(last=False)
+        self._ids[user_id] = None
+
+    def warm(self, user_ids: Iterable[str]) -> int:
+        """ Add up to max_size ids, returns how many were added
+        """
+        added: int = 0
+        for user_id in user_ids:
+            if len(self._ids) >= self.max_size:
+                break
+            if user_id not in self._ids:
+                self._ids[user_id] = None
+                added += 1
+        return added
@@ -13,6 +13,12 @@ class Database(ABC):
     def set_record(self, table: str, key: Any, data: Any) -> None:
         pass
     
+    @abstractmethod
+    def set_records(self, changes: dict[str, dict[Any, Any]]) -> None:
+        """ Write {table: {key: data}} as one atomic change
+        """
+        pass
+
     @abstractmethod
     def get_table(self, table: str) -> Any:
         pass
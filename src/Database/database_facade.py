@@ -1,40 +1,69 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Iterable, Optional
 
 from ..API.model import (
     Stats,
     User,
-    Checkin
+    CheckinHistoryPage,
+    LeaderboardEntry,
+    XpGrantResult
 )
+from ..API.leveling import LevelCurve
+from .model import SaveReport
+from .unit_of_work import UnitOfWork
+from ..API.concurrency import KeyedLocks
+from ..Logging.logger import Logger
+
+LOGGER = Logger(__file__)
 
 class DatabaseFacade(ABC):
+    """ Reads and commits on the command path are awaited, so a backend can
+        do I/O without blocking the event loop. Loading runs once at startup
+        and may block.
+    """
+
+    level_curve: LevelCurve # used by transactions to resolve xp grants
+    record_locks: KeyedLocks # user id -> held by the transaction changing that user's records
 
     @abstractmethod
-    def get_stats(self, user_id: int) -> Stats:
+    async def get_stats(self, user_id: int) -> Stats:
         pass
     
     @abstractmethod
-    def create_missing_user_data(self, user: User) -> None:
+    async def create_missing_user_data(self, user: User) -> None:
         pass
 
     @abstractmethod
-    def get_user(self, user_id: int) -> User:
+    async def get_user(self, user_id: int) -> User:
         pass
 
     @abstractmethod
-    def create_checkin(self, checkin: Checkin) -> str:
+    async def has_user(self, user_id: str) -> bool:
+        """ True if the user's records all exist, without raising
+        """
         pass
 
     @abstractmethod
-    def update_users_last_checkin(self, user_id: int, new_checkin_id: int, checkin: Checkin) -> None:
+    def get_user_ids(self) -> Iterable[str]:
         pass
-    
+
+    @abstractmethod
+    def get_leaderboard(self, n: int) -> list[LeaderboardEntry]:
+        """ The n highest ranked users, best first
+        """
+        pass
+
     @abstractmethod
-    def update_users_github_name(self, user_id: int, github_name: str) -> None:
+    def get_rank(self, user_id: str) -> Optional[LeaderboardEntry]:
         pass
 
     @abstractmethod
-    def save_db(self, permanent: bool = False) -> None:
+    async def get_checkin_history(self, user_id: int, page: int, page_size: int) -> CheckinHistoryPage:
+        pass
+
+    @abstractmethod
+    async def save_db(self, permanent: bool = False) -> SaveReport:
         pass
 
     @abstractmethod
@@ -42,5 +71,75 @@ class DatabaseFacade(ABC):
         pass
 
     @abstractmethod
-    def give_xp(self, user_id: int, amount: int) -> bool:
+    def has_unsaved_changes(self) -> bool:
+        """ True if anything was written since the last save
+        """
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        """ Release files, connections and threads, nothing is written afterwards
+        """
+        pass
+
+    # Shared by every backend, they only go through transaction()
+
+    async def give_xp(self, user_id: int, amount: int) -> bool:
+        async with self.transaction(user_id) as unit_of_work:
+            leveled_up: bool = await unit_of_work.give_xp(user_id, amount)
+        if LOGGER.is_enabled_for("debug"):
+            stats: Stats = await unit_of_work.get_stats(user_id)
+            LOGGER.debug("Updated user %s's stats: %s", user_id, stats.model_dump_json())
+        return leveled_up
+
+    async def give_xp_bulk(self, grants: dict[str, int]) -> list[XpGrantResult]:
+        """ Every grant in one commit, users must already exist
+        """
+        results: list[XpGrantResult] = []
+        async with self.transaction(*grants) as unit_of_work:
+            for user_id, amount in grants.items():
+                leveled_up: bool = await unit_of_work.give_xp(user_id, amount)
+                stats: Stats = await unit_of_work.get_stats(user_id)
+                results.append(XpGrantResult(
+                    user_id=user_id,
+                    amount=amount,
+                    level=stats.level,
+                    xp=stats.xp,
+                    leveled_up=leveled_up
+                ))
+        LOGGER.info("Granted xp to %s users, %s leveled up", len(results), sum(r.leveled_up for r in results))
+        return results
+
+    async def update_users_github_name(self, user_id: int, github_name: str) -> None:
+        async with self.transaction(user_id) as unit_of_work:
+            user: User = await unit_of_work.get_user(user_id)
+            user.github_name = github_name
+            unit_of_work.put('users', user_id, user)
+        LOGGER.info("Set user %s's github name to %s", user_id, github_name)
+
+    @asynccontextmanager
+    async def transaction(self, *user_ids: str) -> AsyncIterator[UnitOfWork]:
+        """ Commits everything put() in the block, or nothing if it raises.
+            Records are read and written back across awaits, so the block holds
+            the locks of `user_ids`, every user whose records it changes
+        """
+        async with self.record_locks.lock_all(user_ids):
+            unit_of_work = UnitOfWork(self)
+            yield unit_of_work
+            await unit_of_work.commit()
+
+    @abstractmethod
+    async def read_record(self, table: str, key: Any) -> Any:
+        """ A copy of the record that is safe to mutate
+        """
+        pass
+
+    @abstractmethod
+    def new_checkin_id(self) -> str:
+        pass
+
+    @abstractmethod
+    async def write_records(self, changes: dict[str, dict[Any, Any]]) -> None:
+        """ Returns once the changes are stored, raises if they couldn't be
+        """
         pass
@@ -1,41 +1,67 @@
-from uuid import uuid4
 from pathlib import Path
-import os
-from typing import Optional
+import asyncio
+from typing import Any, Iterable, Optional
 import time
 
+from pydantic import TypeAdapter
+
 from .database_facade import DatabaseFacade
 from .database import Database
-from .model import DatabaseSettings
+from .ranking import RankingIndex
+from .model import DatabaseSettings, SaveReport
+from .journal import Journal
+from .schema import Schema
+from .records import RecordTable, HistoryTable
+from .snapshot_store import SnapshotStore
+from .snapshot_codec import record_adapters
 from ..API.model import (
     Stats,
     User,
-    LevelingSettings,
-    Checkin
+    Checkin,
+    CheckinHistoryPage,
+    LeaderboardEntry
 )
+from ..API.leveling import LevelCurve, DEFAULT_LEVEL_CURVE
+from ..API.concurrency import KeyedLocks
 from ..Logging.logger import Logger
 
-LOGGER = Logger(__file__, "debug")
+LOGGER = Logger(__file__)
 
 class InMemoryDatabaseFacade(DatabaseFacade):
 
     def __init__(
         self, 
         database: Database,
-        database_settings: DatabaseSettings
+        database_settings: DatabaseSettings,
+        level_curve: LevelCurve = DEFAULT_LEVEL_CURVE
     ):
         self.database = database
         self.database_settings = database_settings
+        self.ranking = RankingIndex()
+        self.level_curve = level_curve
+        self.record_locks = KeyedLocks()
+        self.snapshots = SnapshotStore(database_settings)
+        self.journal: Optional[Journal] = None
+        self._save_lock = asyncio.Lock()
+
+        if database_settings.journal_enabled:
+            self.journal = Journal(
+                Path(database_settings.save_folder),
+                Path(database_settings.save_filename).stem,
+                database_settings.journal_fsync_batch_size,
+                database_settings.journal_fsync_interval
+            )
+            self.database.set_journal(self.journal)
 
-    def get_stats(self, user_id: int) -> Stats:
+    async def get_stats(self, user_id: int) -> Stats:
         return self.database.get_record('stats', user_id)
     
-    def create_missing_user_data(self, user: User) -> None:
+    async def create_missing_user_data(self, user: User) -> None:
         try:
             self.database.get_record('users', user.id)
             # TODO update info where necessary since dynamic user data may have changed since last time
         except KeyError:
-            LOGGER.info(f"Creating a new User in users: {user.model_dump()}")
+            LOGGER.info("Creating a new User in users: %s", user.model_dump())
             self.database.set_record('users', user.id, user)
         
         try:
@@ -43,116 +69,190 @@ class InMemoryDatabaseFacade(DatabaseFacade):
         except KeyError:
             stats = Stats(
                 xp=0,
-                total_xp_needed=LevelingSettings.xp_to_next_level(1),
+                total_xp_needed=self.level_curve.xp_to_next_level(1),
                 level=1
             )
-            LOGGER.info(f"Creating a new Stats in stats: {stats.model_dump()}")
+            LOGGER.info("Creating a new Stats in stats: %s", stats.model_dump())
             self.database.set_record('stats', user.id, stats)
+            self.ranking.update(user.id, stats.level, stats.xp)
 
-    def get_user(self, user_id: int) -> User:
+    async def get_user(self, user_id: int) -> User:
         user: User = self.database.get_record('users', user_id)
-        LOGGER.debug(f"Retrieved user from db: {user.model_dump()}")
-        return User.model_validate(user)
-        
-    def give_xp(self, user_id: int, amount: int) -> bool:
-        stats: Stats = self.database.get_record('stats', user_id)
+        if LOGGER.is_enabled_for("debug"):
+            LOGGER.debug("Retrieved user from db: %s", user.model_dump())
+        return user
 
-        leveled_up: bool = False
+    async def has_user(self, user_id: str) -> bool:
+        return user_id in self.database.get_table('users') and user_id in self.database.get_table('stats')
 
-        stats.xp += amount
-        if (stats.total_xp_needed - stats.xp) <= 0:
-            stats.level += 1
-            leveled_up = True
-            stats.xp = 0
-            stats.total_xp_needed = LevelingSettings.xp_to_next_level(stats.level)
-        
-        self.database.set_record('stats', user_id, stats)
-        LOGGER.debug(f"Updated user {user_id}'s stats: {stats.model_dump_json()}")
-        return leveled_up
-
-    def create_checkin(self, checkin: Checkin) -> str:
-        new_checkin_id: str = str(uuid4())
-        self.database.set_record('checkins', new_checkin_id, checkin)
-        LOGGER.info(f"Created new checkin: {new_checkin_id}")
-        return new_checkin_id
-
-    def update_users_last_checkin(self, user: User, new_checkin_id: int, checkin: Checkin) -> None:
-        user: User = self.get_user(user.id)
-        user.last_checkin_id = new_checkin_id
-        user.last_checkin = checkin
-
-        self.database.set_record('users', user.id, user)
-
-        LOGGER.info(f"Updated user {user.id}'s last checkin to: {new_checkin_id}")
-        LOGGER.debug(f"New user data: {user.model_dump_json()}")
-
-    def update_users_github_name(self, user_id: int, github_name: str) -> None:
-        user: User = self.get_user(user_id)
-        user.github_name = github_name
-        self.database.set_record('users', user_id, user)
-        LOGGER.info(f"Set user {user_id}'s github name to {github_name}")
-
-    def save_db(self, permanent: bool = False) -> None:
-        if permanent:
-            folder_path = Path(self.database_settings.save_folder)
-            stem, suffix = Path(self.database_settings.save_filename).stem, Path(self.database_settings.save_filename).suffix
-            timestamp_str = str(int(time.time()))
-            filename = Path(f"{stem}_{timestamp_str}{suffix}")
-            filepath: Path = folder_path / filename
-
-        else:
-            filepath: Path = self._get_save_filename()
-
-        with open(filepath, 'w') as file:
-            file.write(self.database.get_schema().model_dump_json())
+    def get_user_ids(self) -> Iterable[str]:
+        return iter(self.database.get_table('users'))
 
-    def load_db(self) -> bool:
-        filepath: Path = self._get_latest_filename()
+    def get_leaderboard(self, n: int) -> list[LeaderboardEntry]:
+        return self.ranking.top(n)
 
-        if not filepath or not os.path.exists(filepath):
-            return False
+    def get_rank(self, user_id: str) -> Optional[LeaderboardEntry]:
+        return self.ranking.rank(user_id)
 
-        schema_type: type = type(self.database.get_schema())
-        with open(filepath, 'r') as file:
-            self.database.db = schema_type.model_validate_json(file.read())
-            return True
-        
-        return False
+    async def get_checkin_history(self, user_id: int, page: int, page_size: int) -> CheckinHistoryPage:
+        history: HistoryTable = self.database.get_table('user_checkins')
+        total: int = history.count(user_id)
 
-    def _get_save_filename(self) -> Path:
-        """
-        Save to 1 of 3 save files on a rolling basis
+        # Pages count back from the newest checkin
+        end: int = max(0, total - (page - 1) * page_size)
+        start: int = max(0, end - page_size)
+        checkins: list[Checkin] = [
+            self.database.get_record('checkins', checkin_id)
+            for checkin_id in reversed(history.slice(user_id, start, end))
+        ]
+
+        return CheckinHistoryPage(
+            checkins=checkins,
+            page=page,
+            total_pages=max(1, -(-total // page_size)),
+            total_checkins=total
+        )
+
+    async def read_record(self, table: str, key: Any) -> Any:
+        # Rows are turned into new models on every read, nothing to copy
+        return self.database.get_record(table, key)
+
+    def new_checkin_id(self) -> str:
+        return self.database.get_table('checkins').allocate_id()
+
+    async def write_records(self, changes: dict[str, dict[Any, Any]]) -> None:
+        checkins: RecordTable = self.database.get_table('checkins')
+        new_checkins: list[tuple[str, str]] = [
+            (checkin.user_id, checkin_id)
+            for checkin_id, checkin in changes.get('checkins', {}).items()
+            if checkin_id not in checkins
+        ]
+
+        self.database.set_records(changes)
+
+        # The history index is derived from the checkins, so it is appended to
+        # in place instead of journaled or written to deltas, see load_db
+        history: HistoryTable = self.database.get_table('user_checkins')
+        for user_id, checkin_id in new_checkins:
+            history.append(user_id, checkin_id)
+
+        for user_id, stats in changes.get('stats', {}).items():
+            self.ranking.update(user_id, stats.level, stats.xp)
+
+    async def save_db(self, permanent: bool = False) -> SaveReport:
+        """ Snapshot on the event loop, serialize and write in a worker thread
         """
-        folder_path = Path(self.database_settings.save_folder)
-        folder_path.mkdir(parents=True, exist_ok=True)
+        async with self._save_lock:
+            started: float = time.perf_counter()
+
+            if self.journal is not None and not permanent:
+                if self.journal.records_written < self.database_settings.journal_compact_threshold:
+                    # Mutations are already durable in the journal, no need to rewrite anything yet
+                    await asyncio.to_thread(self.journal.sync)
+                    return self._save_report("journal", None, 0, started)
+
+            full: bool = (
+                permanent
+                or self.snapshots.base is None
+                or self.snapshots.needs_full_save
+                or self.snapshots.delta_count >= self.database_settings.max_deltas
+            )
+
+            # Rows are replaced rather than mutated, so copying the tables
+            # freezes a consistent view while commands keep running
+            retired_segments: list[Path] = self.journal.rotate() if self.journal is not None else []
+            dirty: dict[str, set] = self.database.take_dirty()
+            try:
+                if full:
+                    tables: dict[str, RecordTable] = self.database.copy_tables()
+                    filepath, size = await asyncio.to_thread(self._write_full, tables, permanent)
+                else:
+                    changes: dict[str, dict] = {
+                        table: {key: self.database.get_record(table, key) for key in keys}
+                        for table, keys in dirty.items()
+                    }
+                    filepath, size = await asyncio.to_thread(self._write_delta, changes)
+            except Exception:
+                self.database.restore_dirty(dirty)
+                raise
 
-        stem, suffix = Path(self.database_settings.save_filename).stem, Path(self.database_settings.save_filename).suffix
+            if self.journal is not None:
+                await asyncio.to_thread(self.journal.discard, retired_segments)
 
-        # define the 3 rolling filenames
-        candidates = [folder_path / f"{stem}_{i}{suffix}" for i in range(1, 4)]
+            return self._save_report("full" if full else "delta", filepath, size, started)
 
-        # pick the oldest file (or a missing one)
-        oldest_file = min(
-            candidates,
-            key=lambda f: f.stat().st_mtime if f.exists() else float("-inf")
+    def has_unsaved_changes(self) -> bool:
+        if not self.database.dirty:
+            return False
+        if self.journal is None:
+            return True
+        # Journaled changes only need an fsync, until the journal is due for compaction
+        return (
+            self.journal.unsynced > 0
+            or self.journal.records_written >= self.database_settings.journal_compact_threshold
         )
 
-        return oldest_file
+    async def close(self) -> None:
+        if self.journal is not None:
+            await asyncio.to_thread(self.journal.close)
 
-    
-    def _get_latest_filename(self) -> Optional[Path]:
-        """
-        Get the most recently modified file in the save folder.
+    def _save_report(self, kind: str, filepath: Optional[Path], size: int, started: float) -> SaveReport:
+        report = SaveReport(
+            kind=kind,
+            filepath=str(filepath) if filepath else None,
+            size_bytes=size,
+            duration_seconds=time.perf_counter() - started
+        )
+        LOGGER.info("Saved db (%s): %s bytes in %.3fs", report.kind, report.size_bytes, report.duration_seconds)
+        return report
+
+    def _write_full(self, tables: dict[str, RecordTable], permanent: bool) -> tuple[Path, int]:
+        snapshot: Schema = self.database.schema_from_tables(tables)
+        return self.snapshots.write_full(snapshot, permanent)
+
+    def _write_delta(self, changes: dict[str, dict]) -> tuple[Optional[Path], int]:
+        """ Write only the records changed since the last snapshot
         """
-        folder_path = Path(self.database_settings.save_folder)
+        tables: dict[str, dict] = {
+            table: {key: self._dump_record(record) for key, record in records.items()}
+            for table, records in changes.items()
+            if records
+        }
+        return self.snapshots.write_delta(tables)
+
+    @staticmethod
+    def _dump_record(data) -> dict:
+        if hasattr(data, "model_dump"):
+            return data.model_dump(mode="json")
+        return data
 
-        if not folder_path.exists():
-            return None
+    def load_db(self) -> bool:
+        schema_type: type = Schema
+        tables: dict[str, dict] = self.snapshots.load(schema_type)
+
+        replayed: int = 0
+        replayed_keys: dict[str, set] = {}
+        if self.journal is not None:
+            adapters: dict[str, TypeAdapter] = record_adapters(schema_type)
+            for table, key, data in self.journal.replay():
+                tables.setdefault(table, {})[key] = adapters[table].validate_python(data)
+                replayed_keys.setdefault(table, set()).add(key)
+                replayed += 1
+            if replayed:
+                LOGGER.info("Replayed %s journal records", replayed)
+
+        if not tables:
+            return False
 
-        # grab only files (ignore subfolders)
-        files = [f for f in folder_path.iterdir() if f.is_file()]
-        if not files:
-            return None
+        # Records are validated by the codec, deltas and journal replay already
+        self.database.load_tables(tables)
+        # Replayed records are only on disk in the journal, the next snapshot
+        # retires its segments so it has to include them
+        self.database.restore_dirty(replayed_keys)
+        self.ranking.rebuild((user_id, stats.level, stats.xp) for user_id, stats in tables.get('stats', {}).items())
 
-        # pick the newest one by modified time
-        return max(files, key=lambda f: f.stat().st_mtime)
+        # Only full snapshots store the history index, list checkins added since
+        listed: int = self.database.get_table('user_checkins').add_unlisted()
+        if listed:
+            LOGGER.info("Added %s checkins to the checkin history index", listed)
+        return True
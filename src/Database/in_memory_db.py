@@ -1,35 +1,107 @@
-from typing import Any
+from typing import Any, Optional
 
 from .database import Database
 from .schema import Schema
+from .journal import Journal
+from .records import (
+    RecordTable,
+    CheckinTable,
+    StatsTable,
+    UserTable,
+    HistoryTable
+)
 
 class InMemoryDatabase(Database):
+    """ Records are kept as compact rows and turned into pydantic models
+        only when they are read, see records.py
+    """
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, journal: Optional[Journal] = None):
         self.name = name
-        self.db = Schema()
+        self.tables: dict[str, RecordTable] = self._empty_tables()
+        self.journal = journal
+        self.dirty: dict[str, set[Any]] = {} # table -> keys changed since the last snapshot
 
     def get_record(self, table: str, key: Any) -> Any:
         db_table: Any = self.get_table(table)
         if key not in db_table:
             raise KeyError(f"Key '{key}' not in table '{table}'")
 
-        return db_table.get(key)
+        return db_table[key]
     
     def set_record(self, table: str, key: Any, data: Any) -> None:
         db_table: dict = self.get_table(table)
         db_table[key] = data
+        self.dirty.setdefault(table, set()).add(key)
 
-    def get_table(self, table: str) -> dict:
-        db_table: dict = getattr(self.db, table)
+        if self.journal is not None:
+            self.journal.append(table, key, data)
+
+    def set_records(self, changes: dict[str, dict[Any, Any]]) -> None:
+        for table, records in changes.items():
+            self.get_table(table).update(records)
+            self.dirty.setdefault(table, set()).update(records)
+
+        if self.journal is not None:
+            self.journal.append_batch([
+                (table, key, data) for table, records in changes.items() for key, data in records.items()
+            ])
+
+    def get_table(self, table: str) -> RecordTable:
+        db_table: Optional[RecordTable] = self.tables.get(table)
 
         if db_table is None:
-            raise KeyError(f"Table '{table}' not in db. Available tables: {self.db.keys()}")
+            raise KeyError(f"Table '{table}' not in db. Available tables: {list(self.tables)}")
 
         return db_table
     
     def get_table_names(self) -> list[str]:
-        return list(self.db.model_dump().keys())
+        return list(self.tables)
     
     def get_schema(self) -> Schema:
-        return self.db
+        """ Every record as a model, this builds all of them
+        """
+        return self.schema_from_tables(self.tables)
+
+    @staticmethod
+    def schema_from_tables(tables: dict[str, RecordTable]) -> Schema:
+        return Schema.model_construct(**{table: records.to_models() for table, records in tables.items()})
+
+    def copy_tables(self) -> dict[str, RecordTable]:
+        """ Point in time copy of every table, cheap since rows are shared
+        """
+        return {table: records.copy() for table, records in self.tables.items()}
+
+    def load_tables(self, tables: dict[str, dict[Any, Any]]) -> None:
+        """ Replace everything with `tables` of models, without journaling or marking them dirty
+        """
+        self.tables = self._empty_tables()
+        # Checkins first so users can point at their last checkin's row
+        for table, records in self.tables.items():
+            records.update(tables.get(table, {}))
+        self.dirty = {}
+
+    @staticmethod
+    def _empty_tables() -> dict[str, RecordTable]:
+        checkins = CheckinTable()
+        return {
+            'checkins': checkins,
+            'users': UserTable(checkins),
+            'stats': StatsTable(),
+            'user_checkins': HistoryTable(checkins)
+        }
+
+    def take_dirty(self) -> dict[str, set[Any]]:
+        """ Keys changed since the last call, per table
+        """
+        dirty, self.dirty = self.dirty, {}
+        return dirty
+
+    def restore_dirty(self, dirty: dict[str, set[Any]]) -> None:
+        """ Put back keys from take_dirty() whose snapshot failed
+        """
+        for table, keys in dirty.items():
+            self.dirty.setdefault(table, set()).update(keys)
+
+    def set_journal(self, journal: Optional[Journal]) -> None:
+        self.journal = journal
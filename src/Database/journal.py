@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Iterator, Optional, TextIO
+
+from ..Logging.logger import Logger
+
+LOGGER = Logger(__file__)
+
+
+class Journal:
+    """ Append-only log of set_record mutations.
+        Each line is one {"table", "key", "data"} record, or a {"batch": [...]}
+        of records that must replay together. Lines are flushed to the OS by
+        the caller. A background flusher thread fsyncs them once
+        fsync_batch_size lines are pending, or at most fsync_interval after
+        they were written, so the event loop never waits on the disk.
+        The log is split into numbered segments so a snapshot can retire
+        everything written before it.
+    """
+
+    SUFFIX = ".journal"
+
+    def __init__(
+        self,
+        folder: Path,
+        stem: str,
+        fsync_batch_size: int = 32,
+        fsync_interval: float = 1.0
+    ):
+        self.folder = Path(folder)
+        self.stem = stem
+        self.fsync_batch_size = fsync_batch_size
+        self.fsync_interval = fsync_interval
+
+        self.records_written: int = 0 # since the last compaction
+        self._file: Optional[TextIO] = None
+        self._retired_files: list[TextIO] = [] # rotated out, the flusher still fsyncs and closes them
+        self._lines_written: int = 0
+        self._lines_synced: int = 0
+        self._lock = threading.Lock() # guards the files and _lines_written
+        self._sync_lock = threading.Lock() # one fsync pass at a time
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._stopping: bool = False
+
+    def append(self, table: str, key: Any, data: Any) -> None:
+        self._write_line(self._record(table, key, data), 1)
+
+    def append_batch(self, records: list[tuple[str, Any, Any]]) -> None:
+        """ One line for all of `records`, a torn write loses all of them or none
+        """
+        self._write_line({"batch": [self._record(table, key, data) for table, key, data in records]}, len(records))
+
+    @staticmethod
+    def _record(table: str, key: Any, data: Any) -> dict:
+        if hasattr(data, "model_dump"):
+            data = data.model_dump(mode="json")
+        return {"table": table, "key": key, "data": data}
+
+    def _write_line(self, line: dict, records: int) -> None:
+        encoded: str = json.dumps(line, separators=(",", ":")) + "\n"
+        with self._lock:
+            file = self._open_segment()
+            file.write(encoded)
+            file.flush()
+            self._lines_written += 1
+
+        self.records_written += records
+        if self._flusher is None:
+            self._start_flusher()
+        if self.unsynced >= self.fsync_batch_size:
+            self._wake.set()
+
+    @property
+    def unsynced(self) -> int:
+        """ Lines written since the last fsync
+        """
+        return self._lines_written - self._lines_synced
+
+    def sync(self) -> None:
+        """ fsync every line written so far, safe to call from any thread
+        """
+        with self._sync_lock:
+            with self._lock:
+                retired, self._retired_files = self._retired_files, []
+                target: int = self._lines_written
+                fd: Optional[int] = None
+                if self._file is not None and target > self._lines_synced:
+                    # A duplicate stays valid even if the segment is rotated out meanwhile
+                    fd = os.dup(self._file.fileno())
+
+            for file in retired:
+                os.fsync(file.fileno())
+                file.close()
+            if fd is not None:
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self._lines_synced = target
+
+    def _start_flusher(self) -> None:
+        self._stopping = False
+        self._flusher = threading.Thread(target=self._flush_loop, name=f"journal-{self.stem}", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stopping:
+            # Woken early once a batch is pending, an idle tail waits at most one interval
+            self._wake.wait(self.fsync_interval)
+            self._wake.clear()
+            try:
+                self.sync()
+            except OSError as e:
+                LOGGER.error("Journal fsync failed: %r", e)
+
+    def rotate(self) -> list[Path]:
+        """ Close the current segment, returns every segment written so far.
+            Later appends go to a new segment.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._retired_files.append(self._file)
+                self._file = None
+        self._wake.set()
+        self.records_written = 0
+        return self.segments()
+
+    def discard(self, segments: list[Path]) -> None:
+        for segment in segments:
+            segment.unlink(missing_ok=True)
+        LOGGER.debug("Discarded %s journal segment(s)", len(segments))
+
+    def segments(self) -> list[Path]:
+        if not self.folder.exists():
+            return []
+        return sorted(self.folder.glob(f"{self.stem}_*{self.SUFFIX}"), key=self._sequence)
+
+    def replay(self) -> Iterator[tuple[str, Any, Any]]:
+        """ Yield (table, key, data) for every record, oldest first
+        """
+        for segment in self.segments():
+            with open(segment, "r") as file:
+                for line_number, line in enumerate(file, start=1):
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Only a torn final write can leave a partial line
+                        LOGGER.warn("Ignoring incomplete journal record %s:%s", segment.name, line_number)
+                        break
+                    for record in record.get("batch", [record]):
+                        yield record["table"], record["key"], record["data"]
+
+    def close(self) -> None:
+        """ Stop the flusher, then fsync and close the segment. Appending again starts a new one
+        """
+        if self._flusher is not None:
+            self._stopping = True
+            self._wake.set()
+            self._flusher.join()
+            self._flusher = None
+
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open_segment(self) -> TextIO:
+        """ Called with _lock held
+        """
+        if self._file is None:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            existing = self.segments()
+            sequence = self._sequence(existing[-1]) + 1 if existing else 1
+            self._file = open(self.folder / f"{self.stem}_{sequence:06d}{self.SUFFIX}", "a")
+        return self._file
+
+    @staticmethod
+    def _sequence(segment: Path) -> int:
+        return int(segment.stem.rsplit("_", 1)[1])
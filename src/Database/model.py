@@ -1,6 +1,37 @@
+from datetime import datetime
+from typing import Optional
+
 from pydantic import BaseModel
 
 class DatabaseSettings(BaseModel):
     save_filename: str
     save_folder: str
-    
\ No newline at end of file
+    journal_enabled: bool = True
+    journal_fsync_batch_size: int = 32 # records written before forcing them to disk
+    journal_fsync_interval: float = 1.0 # seconds before unsynced records are forced to disk
+    journal_compact_threshold: int = 10000 # records before an autosave folds the journal into a snapshot
+    snapshot_codec: str = "json" # "json" or "binary", loading reads the codec from each snapshot's header
+    max_deltas: int = 12 # incremental snapshots kept before the next save rewrites everything
+    sqlite_filename: str = "db.sqlite3" # used by the SQLite backend, inside save_folder
+    backup_folder: str = "backups" # permanent saves, inside save_folder
+    backup_compression: str = "gzip" # "gzip", "zstd" (needs the zstandard package) or "none"
+    retention_daily: int = 7 # newest backup of each of the last N days is kept
+    retention_weekly: int = 8 # newest backup of each of the last M weeks is kept
+    partition_folder: str = "guilds" # one subfolder per guild partition, inside save_folder
+
+class SaveReport(BaseModel):
+    kind: str # "journal", "delta" or "full"
+    filepath: Optional[str]
+    size_bytes: int
+    duration_seconds: float
+
+class SnapshotEntry(BaseModel):
+    filename: str
+    sha256: str
+    size_bytes: int
+    created: datetime
+
+class SnapshotManifest(BaseModel):
+    base: Optional[SnapshotEntry] = None
+    deltas: list[SnapshotEntry] = [] # applied on top of base, oldest first
+    backups: list[SnapshotEntry] = [] # relative to backup_folder
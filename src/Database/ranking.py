@@ -0,0 +1,165 @@
+import random
+from typing import Any, Iterable, Iterator, Optional
+
+from ..API.model import LeaderboardEntry
+
+
+class _Node:
+
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Any, height: int):
+        self.key = key
+        self.next: list[Optional["_Node"]] = [None] * height
+        self.width: list[int] = [1] * height # positions skipped by next[level]
+
+
+class RankingIndex:
+    """ Users ordered by (level, xp), highest first, kept as an indexable
+        skip list: update, rank and the start of the top N are O(log n).
+        Users with the same level and xp share a rank.
+    """
+
+    MAX_HEIGHT = 24 # enough for ~16M users
+
+    def __init__(self):
+        self._random = random.Random()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._head = _Node(None, self.MAX_HEIGHT)
+        self._height: int = 1 # levels in use, the ones above are left alone
+        self._size: int = 0
+        self._keys: dict[str, tuple] = {} # user id -> key currently in the list
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._keys
+
+    def update(self, user_id: str, level: int, xp: int) -> None:
+        key: tuple = (-level, -xp, user_id)
+        old: Optional[tuple] = self._keys.get(user_id)
+        if old == key:
+            return
+
+        if old is not None:
+            self._remove(old)
+        self._insert(key)
+        self._keys[user_id] = key
+
+    def rebuild(self, entries: Iterable[tuple[str, int, int]]) -> None:
+        """ Replace the index with (user id, level, xp) entries in one O(n log n) pass
+        """
+        self._reset()
+        keys: list[tuple] = sorted((-level, -xp, user_id) for user_id, level, xp in entries)
+
+        last: list[_Node] = [self._head] * self.MAX_HEIGHT
+        last_position: list[int] = [0] * self.MAX_HEIGHT
+        for position, key in enumerate(keys, start=1):
+            node = _Node(key, self._random_height())
+            for level in range(len(node.next)):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level] = node
+                last_position[level] = position
+            self._height = max(self._height, len(node.next))
+            self._keys[key[2]] = key
+
+        for level in range(self._height):
+            last[level].width[level] = len(keys) + 1 - last_position[level]
+        self._size = len(keys)
+
+    def rank(self, user_id: str) -> Optional[LeaderboardEntry]:
+        key: Optional[tuple] = self._keys.get(user_id)
+        if key is None:
+            return None
+
+        # Everyone strictly ahead, ties on (level, xp) share the best rank
+        ahead: int = self._count_below((key[0], key[1], ""))
+        return LeaderboardEntry(rank=ahead + 1, user_id=user_id, level=-key[0], xp=-key[1])
+
+    def top(self, n: int) -> list[LeaderboardEntry]:
+        entries: list[LeaderboardEntry] = []
+        previous: Optional[tuple] = None
+        for position, key in enumerate(self._iter_keys(), start=1):
+            if len(entries) >= n:
+                break
+            rank: int = entries[-1].rank if previous == key[:2] else position
+            entries.append(LeaderboardEntry(rank=rank, user_id=key[2], level=-key[0], xp=-key[1]))
+            previous = key[:2]
+        return entries
+
+    def _iter_keys(self) -> Iterator[tuple]:
+        node: Optional[_Node] = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def _count_below(self, key: tuple) -> int:
+        node: _Node = self._head
+        count: int = 0
+        for level in reversed(range(self._height)):
+            while node.next[level] is not None and node.next[level].key < key:
+                count += node.width[level]
+                node = node.next[level]
+        return count
+
+    def _insert(self, key: tuple) -> None:
+        chain: list[_Node] = [self._head] * self.MAX_HEIGHT
+        steps_at_level: list[int] = [0] * self.MAX_HEIGHT
+        node: _Node = self._head
+        for level in reversed(range(self._height)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height: int = self._random_height()
+
+        # A level coming into use spans everything so far
+        for level in range(self._height, height):
+            self._head.width[level] = self._size + 1
+        self._height = max(self._height, height)
+
+        new_node = _Node(key, height)
+        steps: int = 0
+        for level in range(height):
+            previous: _Node = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+
+        for level in range(height, self._height):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def _random_height(self) -> int:
+        height: int = 1
+        while height < self.MAX_HEIGHT and self._random.random() < 0.5:
+            height += 1
+        return height
+
+    def _remove(self, key: tuple) -> None:
+        chain: list[_Node] = [self._head] * self.MAX_HEIGHT
+        node: _Node = self._head
+        for level in reversed(range(self._height)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target: Optional[_Node] = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(f"Key '{key}' not in ranking index")
+
+        for level in range(len(target.next)):
+            previous: _Node = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+
+        for level in range(len(target.next), self._height):
+            chain[level].width[level] -= 1
+        self._size -= 1
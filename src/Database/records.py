@@ -0,0 +1,271 @@
+import sys
+from abc import abstractmethod
+from collections.abc import MutableMapping
+from datetime import date, datetime
+from typing import Any, Iterator, Optional
+
+from ..API.model import (
+    User,
+    Stats,
+    Checkin,
+    ProofType,
+    GithubContributionDay
+)
+
+
+class CheckinRow:
+    """ Rows are never mutated once stored, a change stores a new row.
+        That lets users share the row of their last checkin and lets
+        snapshots copy a table without copying its rows.
+    """
+
+    __slots__ = ("user_id", "date", "proof", "proof_type")
+
+    def __init__(self, user_id: str, date: datetime, proof: str, proof_type: Optional[ProofType]):
+        self.user_id = user_id
+        self.date = date
+        self.proof = proof
+        self.proof_type = proof_type
+
+    @staticmethod
+    def from_model(checkin: Checkin) -> "CheckinRow":
+        return CheckinRow(sys.intern(checkin.user_id), checkin.date, checkin.proof, checkin.proof_type)
+
+    def to_model(self) -> Checkin:
+        return Checkin.model_construct(
+            user_id=self.user_id,
+            date=self.date,
+            proof=self.proof,
+            proof_type=self.proof_type
+        )
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, CheckinRow):
+            return NotImplemented
+        return (
+            self.user_id == other.user_id
+            and self.date == other.date
+            and self.proof == other.proof
+            and self.proof_type == other.proof_type
+        )
+
+
+class StatsRow:
+
+    __slots__ = ("xp", "total_xp_needed", "level")
+
+    def __init__(self, xp: int, total_xp_needed: int, level: int):
+        self.xp = xp
+        self.total_xp_needed = total_xp_needed
+        self.level = level
+
+    @staticmethod
+    def from_model(stats: Stats) -> "StatsRow":
+        return StatsRow(stats.xp, stats.total_xp_needed, stats.level)
+
+    def to_model(self) -> Stats:
+        return Stats.model_construct(xp=self.xp, total_xp_needed=self.total_xp_needed, level=self.level)
+
+
+class UserRow:
+
+    __slots__ = ("id", "last_checkin_id", "last_checkin", "github_name", "contribution_date", "contribution_count")
+
+    def __init__(
+        self,
+        id: str,
+        last_checkin_id: Any,
+        last_checkin: Optional[CheckinRow],
+        github_name: Optional[str],
+        contribution_date: Optional[date],
+        contribution_count: Optional[int]
+    ):
+        self.id = id
+        self.last_checkin_id = last_checkin_id
+        self.last_checkin = last_checkin
+        self.github_name = github_name
+        self.contribution_date = contribution_date
+        self.contribution_count = contribution_count
+
+
+class RecordTable(MutableMapping):
+    """ Stores compact rows, reads and writes pydantic models.
+        Every read builds a new model, so callers are free to mutate it.
+    """
+
+    def __init__(self):
+        self.rows: dict[Any, Any] = {}
+
+    def _key(self, key: Any) -> Any:
+        """ Key as stored in rows
+        """
+        return sys.intern(key) if isinstance(key, str) else key
+
+    def _public_key(self, key: Any) -> Any:
+        return key
+
+    @abstractmethod
+    def _to_row(self, record: Any) -> Any:
+        pass
+
+    @abstractmethod
+    def _to_model(self, row: Any) -> Any:
+        pass
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._to_model(self.rows[self._key(key)])
+
+    def __setitem__(self, key: Any, record: Any) -> None:
+        self.rows[self._key(key)] = self._to_row(record)
+
+    def __delitem__(self, key: Any) -> None:
+        del self.rows[self._key(key)]
+
+    def __contains__(self, key: Any) -> bool:
+        return self._key(key) in self.rows
+
+    def __iter__(self) -> Iterator[Any]:
+        return map(self._public_key, self.rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def copy(self) -> "RecordTable":
+        """ Shallow copy, rows are shared since they are never mutated
+        """
+        table = object.__new__(type(self))
+        table.__dict__.update(self.__dict__)
+        table.rows = dict(self.rows)
+        return table
+
+    def to_models(self) -> dict[Any, Any]:
+        return {self._public_key(key): self._to_model(row) for key, row in self.rows.items()}
+
+
+class CheckinTable(RecordTable):
+    """ New checkins get sequential integer ids, exposed as decimal strings.
+        Ids from before that (uuid4 strings) are kept as they are.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._next_id: int = 1
+
+    def _key(self, key: Any) -> Any:
+        if isinstance(key, str) and key.isdecimal():
+            return int(key)
+        return key
+
+    def _public_key(self, key: Any) -> Any:
+        return str(key)
+
+    def _to_row(self, record: Checkin) -> CheckinRow:
+        return CheckinRow.from_model(record)
+
+    def _to_model(self, row: CheckinRow) -> Checkin:
+        return row.to_model()
+
+    def __setitem__(self, key: Any, record: Any) -> None:
+        key = self._key(key)
+        if isinstance(key, int) and key >= self._next_id:
+            self._next_id = key + 1
+        self.rows[key] = self._to_row(record)
+
+    def allocate_id(self) -> str:
+        checkin_id, self._next_id = self._next_id, self._next_id + 1
+        return str(checkin_id)
+
+
+class StatsTable(RecordTable):
+
+    def _to_row(self, record: Stats) -> StatsRow:
+        return StatsRow.from_model(record)
+
+    def _to_model(self, row: StatsRow) -> Stats:
+        return row.to_model()
+
+
+class UserTable(RecordTable):
+    """ A user's last checkin points at the row in the checkins table
+        instead of keeping a copy of it.
+    """
+
+    def __init__(self, checkins: CheckinTable):
+        super().__init__()
+        self.checkins = checkins
+
+    def _to_row(self, record: User) -> UserRow:
+        last_checkin: Optional[CheckinRow] = None
+        if record.last_checkin is not None:
+            last_checkin = CheckinRow.from_model(record.last_checkin)
+            stored: Optional[CheckinRow] = self.checkins.rows.get(self.checkins._key(record.last_checkin_id))
+            if stored == last_checkin:
+                last_checkin = stored
+
+        contribution: Optional[GithubContributionDay] = record.last_github_contribution
+        return UserRow(
+            sys.intern(record.id),
+            self.checkins._key(record.last_checkin_id),
+            last_checkin,
+            record.github_name,
+            contribution.date if contribution else None,
+            contribution.count if contribution else None
+        )
+
+    def _to_model(self, row: UserRow) -> User:
+        return User.model_construct(
+            id=row.id,
+            last_checkin_id=self.checkins._public_key(row.last_checkin_id) if row.last_checkin_id is not None else None,
+            last_checkin=row.last_checkin.to_model() if row.last_checkin is not None else None,
+            github_name=row.github_name,
+            last_github_contribution=GithubContributionDay.model_construct(
+                date=row.contribution_date,
+                count=row.contribution_count
+            ) if row.contribution_date is not None else None
+        )
+
+
+class HistoryTable(RecordTable):
+    """ user id -> checkin ids, stored as the checkins table's own keys.
+        Unlike other rows a history grows in place as checkins are added,
+        so copies copy the rows too.
+    """
+
+    def __init__(self, checkins: CheckinTable):
+        super().__init__()
+        self.checkins = checkins
+
+    def append(self, user_id: str, checkin_id: str) -> None:
+        self.rows.setdefault(self._key(user_id), []).append(self.checkins._key(checkin_id))
+
+    def count(self, user_id: str) -> int:
+        return len(self.rows.get(self._key(user_id), ()))
+
+    def slice(self, user_id: str, start: int, end: int) -> list[str]:
+        """ Checkin ids in [start, end) of the user's history, without building the rest
+        """
+        row: list[Any] = self.rows.get(self._key(user_id), [])
+        return self._to_model(row[start:end])
+
+    def add_unlisted(self) -> int:
+        """ Append checkins that no history lists yet, oldest first. Returns how many
+        """
+        listed: set[Any] = {checkin_id for row in self.rows.values() for checkin_id in row}
+        unlisted = sorted(
+            ((checkin_id, row) for checkin_id, row in self.checkins.rows.items() if checkin_id not in listed),
+            key=lambda item: item[1].date
+        )
+        for checkin_id, row in unlisted:
+            self.rows.setdefault(row.user_id, []).append(checkin_id)
+        return len(unlisted)
+
+    def copy(self) -> "HistoryTable":
+        table = super().copy()
+        table.rows = {key: list(row) for key, row in self.rows.items()}
+        return table
+
+    def _to_row(self, record: list[str]) -> list[Any]:
+        return [self.checkins._key(checkin_id) for checkin_id in record]
+
+    def _to_model(self, row: list[Any]) -> list[str]:
+        return [self.checkins._public_key(checkin_id) for checkin_id in row]
@@ -11,4 +11,4 @@ class Schema(BaseModel):
     users: dict[str, User] = {}
     stats: dict[str, Stats] = {}
     checkins: dict[str, Checkin] = {}
-    user_checkins: dict[str, str] = {}
+    user_checkins: dict[str, list[str]] = {} # user id -> checkin ids, oldest first
@@ -0,0 +1,134 @@
+import gc
+import marshal
+import sys
+from abc import ABC, abstractmethod
+from typing import get_args
+
+from pydantic import TypeAdapter
+
+from .schema import Schema
+
+HEADER_PREFIX = b"KODA-SNAPSHOT 1 "
+
+
+class SnapshotCodec(ABC):
+    """ Turns the Schema tables into snapshot bytes and back.
+        decode() returns {table: {key: record}} ready for Schema.model_construct.
+    """
+
+    name: str = ""
+    portable: bool = True # readable by any Python version, permanent backups are always written portably
+
+    def header(self) -> str:
+        """ Header fields after the prefix, starting with the codec's name
+        """
+        return self.name
+
+    def check_header(self, fields: list[str]) -> None:
+        """ Raise ValueError if a snapshot written with these header fields can't be decoded here
+        """
+        pass
+
+    @abstractmethod
+    def encode(self, snapshot: Schema) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, payload: bytes, schema_type: type[Schema]) -> dict[str, dict]:
+        pass
+
+
+class JsonCodec(SnapshotCodec):
+    """ Pydantic JSON, parsed and validated in one pass by pydantic-core
+    """
+
+    name = "json"
+
+    def encode(self, snapshot: Schema) -> bytes:
+        return snapshot.model_dump_json().encode()
+
+    def decode(self, payload: bytes, schema_type: type[Schema]) -> dict[str, dict]:
+        schema: Schema = schema_type.model_validate_json(payload)
+        return {table: getattr(schema, table) for table in schema_type.model_fields}
+
+
+class BinaryCodec(SnapshotCodec):
+    """ The same records written with marshal instead of JSON, smaller on disk
+        since field names are interned and marshal stores each once, but no
+        faster to load. The marshal format may change between Python
+        versions, so the header records both and other versions refuse to
+        load the snapshot rather than misread it.
+    """
+
+    name = "binary"
+    portable = False
+
+    def header(self) -> str:
+        return f"{self.name} marshal{marshal.version} py{sys.version_info.major}.{sys.version_info.minor}"
+
+    def check_header(self, fields: list[str]) -> None:
+        expected: list[str] = self.header().split()[1:]
+        # Snapshots from before the header recorded versions are tried as they are,
+        # pydantic still validates whatever marshal reads back
+        if fields and fields != expected:
+            raise ValueError(
+                f"Binary snapshot was written with {' '.join(fields)}, "
+                f"this is {' '.join(expected)}. Load it with the Python version that wrote it "
+                f"and save it with the json codec to move it to another version"
+            )
+
+    def encode(self, snapshot: Schema) -> bytes:
+        return marshal.dumps(snapshot.model_dump(mode="json"), marshal.version)
+
+    def decode(self, payload: bytes, schema_type: type[Schema]) -> dict[str, dict]:
+        schema: Schema = schema_type.model_validate(marshal.loads(payload))
+        return {table: getattr(schema, table) for table in schema_type.model_fields}
+
+
+CODECS: dict[str, SnapshotCodec] = {
+    codec.name: codec for codec in (JsonCodec(), BinaryCodec())
+}
+
+
+def get_codec(name: str) -> SnapshotCodec:
+    if name not in CODECS:
+        raise ValueError(f"Unknown snapshot codec '{name}'. Available codecs: {list(CODECS)}")
+    return CODECS[name]
+
+
+def encode_snapshot(snapshot: Schema, codec: SnapshotCodec) -> bytes:
+    """ Snapshot bytes, prefixed with a header line naming the codec
+    """
+    return HEADER_PREFIX + codec.header().encode() + b"\n" + codec.encode(snapshot)
+
+
+def decode_snapshot(data: bytes, schema_type: type[Schema]) -> dict[str, dict]:
+    """ Decode with the codec named in the header. Snapshots written
+        before the header existed are plain JSON.
+    """
+    codec: SnapshotCodec = CODECS[JsonCodec.name]
+    payload: bytes = data
+    if data.startswith(HEADER_PREFIX):
+        header, _, payload = data.partition(b"\n")
+        name, *fields = header[len(HEADER_PREFIX):].decode().split()
+        codec = get_codec(name)
+        codec.check_header(fields)
+
+    # Every record is a handful of new objects, and the cyclic collector
+    # would otherwise rescan all of them over and over while they pile up
+    gc_was_enabled: bool = gc.isenabled()
+    gc.disable()
+    try:
+        return codec.decode(payload, schema_type)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def record_adapters(schema_type: type[Schema]) -> dict[str, TypeAdapter]:
+    """ Per table validator for single records, used for deltas and journal replay
+    """
+    return {
+        table: TypeAdapter(get_args(field.annotation)[1])
+        for table, field in schema_type.model_fields.items()
+    }
@@ -0,0 +1,300 @@
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from pydantic import TypeAdapter
+
+from .model import (
+    DatabaseSettings,
+    SnapshotEntry,
+    SnapshotManifest
+)
+from .schema import Schema
+from .snapshot_codec import (
+    SnapshotCodec,
+    get_codec,
+    JsonCodec,
+    encode_snapshot,
+    decode_snapshot,
+    record_adapters
+)
+from ..Logging.logger import Logger
+
+LOGGER = Logger(__file__)
+
+
+class SnapshotStore:
+    """ Snapshot files in save_folder: a full base, deltas on top of it, and
+        compressed permanent backups. A manifest records the current base and
+        deltas with their checksums, so loading doesn't scan the folder.
+        Methods here do blocking I/O and are meant to run in a worker thread.
+    """
+
+    DELTA_SUFFIX = ".delta"
+    MANIFEST_SUFFIX = ".manifest"
+
+    def __init__(self, database_settings: DatabaseSettings):
+        self.database_settings = database_settings
+        self.folder = Path(database_settings.save_folder)
+        self.stem = Path(database_settings.save_filename).stem
+        self.suffix = Path(database_settings.save_filename).suffix
+        self.manifest_path = self.folder / f"{self.stem}{self.MANIFEST_SUFFIX}"
+        self.backup_folder = self.folder / database_settings.backup_folder
+        self.codec: SnapshotCodec = get_codec(database_settings.snapshot_codec)
+        self.manifest: SnapshotManifest = self._read_manifest()
+        self.needs_full_save: bool = False # set when loading couldn't use every published snapshot
+
+    @property
+    def base(self) -> Optional[str]:
+        return self.manifest.base.filename if self.manifest.base else None
+
+    @property
+    def delta_count(self) -> int:
+        return len(self.manifest.deltas)
+
+    def load(self, schema_type: type[Schema]) -> dict[str, dict]:
+        """ Tables of the base snapshot with its deltas applied
+        """
+        if self.manifest.base is not None:
+            data = self._read_verified(self.folder / self.manifest.base.filename, self.manifest.base)
+            if data is not None:
+                tables: dict[str, dict] = decode_snapshot(data, schema_type)
+                adapters: dict[str, TypeAdapter] = record_adapters(schema_type)
+                for entry in self.manifest.deltas:
+                    delta = self._read_verified(self.folder / entry.filename, entry)
+                    if delta is None:
+                        # Deltas hold whole records, so later ones still apply without it.
+                        # Its records are lost, a full save stops the manifest pointing at it
+                        LOGGER.error("Delta snapshot %s is unreadable, skipping it", entry.filename)
+                        self.needs_full_save = True
+                        continue
+                    self._apply_delta(tables, json.loads(delta), adapters)
+                return tables
+
+            LOGGER.warn("Manifest base snapshot failed verification, falling back to a folder scan")
+            self.needs_full_save = True
+
+        return self._load_by_scan(schema_type)
+
+    def write_full(self, snapshot: Schema, permanent: bool) -> tuple[Path, int]:
+        """ Publish `snapshot` as the new base, also as a compressed backup if permanent
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        data: bytes = encode_snapshot(snapshot, self.codec)
+        filepath: Path = self._get_save_filename()
+        self._atomic_write(filepath, data)
+
+        retired: list[SnapshotEntry] = self.manifest.deltas
+        self.manifest.base = self._entry(filepath.name, data)
+        self.manifest.deltas = []
+        self.needs_full_save = False
+
+        if permanent:
+            # Backups outlive the interpreter, keep them readable by any version
+            self._write_backup(data if self.codec.portable else encode_snapshot(snapshot, get_codec(JsonCodec.name)))
+
+        self._write_manifest()
+
+        # Only once the manifest stops referencing them
+        for entry in retired:
+            (self.folder / entry.filename).unlink(missing_ok=True)
+
+        return filepath, len(data)
+
+    def write_delta(self, tables: dict[str, dict]) -> tuple[Optional[Path], int]:
+        """ Publish records changed since the last snapshot on top of the current base
+        """
+        if not tables:
+            return None, 0
+
+        sequence: int = self._delta_sequence(Path(self.manifest.deltas[-1].filename)) + 1 if self.manifest.deltas else 1
+        filepath: Path = self.folder / f"{self.stem}_{sequence:06d}{self.DELTA_SUFFIX}"
+
+        data: bytes = json.dumps({"base": self.base, "tables": tables}, separators=(",", ":")).encode()
+        self._atomic_write(filepath, data)
+
+        self.manifest.deltas.append(self._entry(filepath.name, data))
+        self._write_manifest()
+        return filepath, len(data)
+
+    def _write_backup(self, data: bytes) -> None:
+        compression: str = self.database_settings.backup_compression
+        if compression == "zstd" and zstandard is None:
+            LOGGER.warn("zstandard is not installed, compressing backup with gzip instead")
+            compression = "gzip"
+
+        if compression == "zstd":
+            compressed, extension = zstandard.ZstdCompressor().compress(data), ".zst"
+        elif compression == "gzip":
+            compressed, extension = gzip.compress(data, compresslevel=6), ".gz"
+        else:
+            compressed, extension = data, ""
+
+        self.backup_folder.mkdir(parents=True, exist_ok=True)
+        timestamp: str = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        filepath: Path = self.backup_folder / f"{self.stem}_{timestamp}{self.suffix}{extension}"
+        self._atomic_write(filepath, compressed)
+
+        # Two permanent saves within a second share a name, the file was just replaced
+        self.manifest.backups = [entry for entry in self.manifest.backups if entry.filename != filepath.name]
+        self.manifest.backups.append(self._entry(filepath.name, compressed))
+        LOGGER.info("Wrote backup %s: %s -> %s bytes", filepath.name, len(data), len(compressed))
+        self._apply_retention()
+
+    def _apply_retention(self) -> None:
+        """ Keep the newest backup of each of the last N days and M ISO weeks
+        """
+        newest_first = sorted(self.manifest.backups, key=lambda entry: entry.created, reverse=True)
+
+        keep: set[str] = set()
+        days: set = set()
+        weeks: set = set()
+        for entry in newest_first:
+            day = entry.created.date()
+            week = entry.created.isocalendar()[:2]
+            if day not in days and len(days) < self.database_settings.retention_daily:
+                days.add(day)
+                keep.add(entry.filename)
+            if week not in weeks and len(weeks) < self.database_settings.retention_weekly:
+                weeks.add(week)
+                keep.add(entry.filename)
+
+        for entry in newest_first:
+            if entry.filename not in keep:
+                (self.backup_folder / entry.filename).unlink(missing_ok=True)
+                LOGGER.info("Retention removed backup %s", entry.filename)
+
+        self.manifest.backups = [entry for entry in self.manifest.backups if entry.filename in keep]
+
+    def _read_manifest(self) -> SnapshotManifest:
+        if not self.manifest_path.exists():
+            return SnapshotManifest()
+
+        try:
+            return SnapshotManifest.model_validate_json(self.manifest_path.read_bytes())
+        except ValueError as e:
+            LOGGER.warn("Ignoring unreadable snapshot manifest: %s", e)
+            return SnapshotManifest()
+
+    def _write_manifest(self) -> None:
+        self._atomic_write(self.manifest_path, self.manifest.model_dump_json(indent=2).encode())
+
+    @staticmethod
+    def _entry(filename: str, data: bytes) -> SnapshotEntry:
+        return SnapshotEntry(
+            filename=filename,
+            sha256=hashlib.sha256(data).hexdigest(),
+            size_bytes=len(data),
+            created=datetime.now(timezone.utc)
+        )
+
+    @staticmethod
+    def _read_verified(filepath: Path, entry: SnapshotEntry) -> Optional[bytes]:
+        try:
+            data: bytes = filepath.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        if hashlib.sha256(data).hexdigest() != entry.sha256:
+            LOGGER.warn("Checksum mismatch for %s", filepath.name)
+            return None
+        return data
+
+    @staticmethod
+    def _apply_delta(tables: dict[str, dict], delta: dict, adapters: dict[str, TypeAdapter]) -> None:
+        for table, records in delta["tables"].items():
+            adapter: TypeAdapter = adapters[table]
+            tables.setdefault(table, {}).update(
+                (key, adapter.validate_python(data)) for key, data in records.items()
+            )
+
+    @staticmethod
+    def _atomic_write(filepath: Path, data: bytes) -> int:
+        """ Publish via temp file + fsync + rename, a crash never leaves a torn snapshot behind
+        """
+        temp_path = filepath.with_name(filepath.name + ".tmp")
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, filepath)
+
+        # Make the rename itself durable
+        dir_fd = os.open(filepath.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+        return len(data)
+
+    # --- folders without a manifest (written before it existed) ---
+
+    def _load_by_scan(self, schema_type: type[Schema]) -> dict[str, dict]:
+        filepath: Optional[Path] = self._get_latest_filename()
+        if filepath is None:
+            return {}
+
+        tables: dict[str, dict] = decode_snapshot(filepath.read_bytes(), schema_type)
+        adapters: dict[str, TypeAdapter] = record_adapters(schema_type)
+
+        for delta in self._get_delta_filenames():
+            try:
+                with open(delta, 'r') as file:
+                    contents: dict = json.load(file)
+            except json.JSONDecodeError:
+                LOGGER.warn("Ignoring incomplete delta snapshot %s", delta.name)
+                break
+
+            if contents["base"] == filepath.name:
+                self._apply_delta(tables, contents, adapters)
+        return tables
+
+    def _get_save_filename(self) -> Path:
+        """
+        Save to 1 of 3 save files on a rolling basis, never over the current base
+        """
+        candidates = [self.folder / f"{self.stem}_{i}{self.suffix}" for i in range(1, 4)]
+        candidates = [f for f in candidates if f.name != self.base]
+
+        # pick the oldest file (or a missing one)
+        return min(
+            candidates,
+            key=lambda f: f.stat().st_mtime if f.exists() else float("-inf")
+        )
+
+    def _get_latest_filename(self) -> Optional[Path]:
+        """
+        Get the most recently modified snapshot in the save folder.
+        """
+        if not self.folder.exists():
+            return None
+
+        # grab only snapshot files (ignore subfolders, journal segments and deltas)
+        files = [f for f in self.folder.iterdir() if f.is_file() and f.suffix == self.suffix]
+        if not files:
+            return None
+
+        # pick the newest one by modified time
+        return max(files, key=lambda f: f.stat().st_mtime)
+
+    def _get_delta_filenames(self) -> list[Path]:
+        """
+        Delta snapshots in the order they were written.
+        """
+        if not self.folder.exists():
+            return []
+        return sorted(self.folder.glob(f"{self.stem}_*{self.DELTA_SUFFIX}"), key=self._delta_sequence)
+
+    @staticmethod
+    def _delta_sequence(delta: Path) -> int:
+        return int(delta.stem.rsplit("_", 1)[1])
@@ -0,0 +1,161 @@
+from uuid import uuid4
+from pathlib import Path
+from typing import Any, Iterable, Optional
+import time
+import asyncio
+
+from .database_facade import DatabaseFacade
+from .sqlite_db import SqliteDatabase
+from .sqlite_migration import migrate_json_snapshots
+from .ranking import RankingIndex
+from .model import DatabaseSettings, SaveReport
+from ..API.model import (
+    Stats,
+    User,
+    Checkin,
+    CheckinHistoryPage,
+    LeaderboardEntry
+)
+from ..API.leveling import LevelCurve, DEFAULT_LEVEL_CURVE
+from ..API.concurrency import KeyedLocks
+from ..Logging.logger import Logger
+
+LOGGER = Logger(__file__)
+
+class SqliteDatabaseFacade(DatabaseFacade):
+
+    def __init__(
+        self,
+        database: SqliteDatabase,
+        database_settings: DatabaseSettings,
+        level_curve: LevelCurve = DEFAULT_LEVEL_CURVE
+    ):
+        self.database = database
+        self.database_settings = database_settings
+        self.ranking = RankingIndex()
+        self.level_curve = level_curve
+        self.record_locks = KeyedLocks()
+        self._unsaved: bool = False # writes since the last checkpoint or backup
+
+    async def get_stats(self, user_id: int) -> Stats:
+        return await self.database.get_record_async('stats', user_id)
+
+    async def create_missing_user_data(self, user: User) -> None:
+        missing: dict[str, dict] = {}
+        try:
+            await self.database.get_record_async('users', user.id)
+        except KeyError:
+            LOGGER.info("Creating a new User in users: %s", user.model_dump())
+            missing['users'] = {user.id: user}
+
+        try:
+            await self.database.get_record_async('stats', user.id)
+        except KeyError:
+            stats = Stats(
+                xp=0,
+                total_xp_needed=self.level_curve.xp_to_next_level(1),
+                level=1
+            )
+            LOGGER.info("Creating a new Stats in stats: %s", stats.model_dump())
+            missing['stats'] = {user.id: stats}
+
+        if missing:
+            await self.write_records(missing)
+
+    async def get_user(self, user_id: int) -> User:
+        user: User = await self.database.get_record_async('users', user_id)
+        if LOGGER.is_enabled_for("debug"):
+            LOGGER.debug("Retrieved user from db: %s", user.model_dump())
+        return user
+
+    async def has_user(self, user_id: str) -> bool:
+        return await self.database.has_user(user_id)
+
+    def get_user_ids(self) -> Iterable[str]:
+        return self.database.get_user_ids()
+
+    def get_leaderboard(self, n: int) -> list[LeaderboardEntry]:
+        return self.ranking.top(n)
+
+    def get_rank(self, user_id: str) -> Optional[LeaderboardEntry]:
+        return self.ranking.rank(user_id)
+
+    async def get_checkin_history(self, user_id: int, page: int, page_size: int) -> CheckinHistoryPage:
+        total: int = await self.database.count_user_checkins(user_id)
+        checkins: list[Checkin] = await self.database.get_user_checkins(user_id, page_size, (page - 1) * page_size)
+
+        return CheckinHistoryPage(
+            checkins=checkins,
+            page=page,
+            total_pages=max(1, -(-total // page_size)),
+            total_checkins=total
+        )
+
+    async def read_record(self, table: str, key: Any) -> Any:
+        # Rows are turned into new objects on every read, nothing to copy
+        return await self.database.get_record_async(table, key)
+
+    def new_checkin_id(self) -> str:
+        return str(uuid4())
+
+    async def write_records(self, changes: dict[str, dict[Any, Any]]) -> None:
+        # Only what was committed reaches the ranking
+        await self.database.set_records_async(changes)
+        self._unsaved = True
+
+        for user_id, stats in changes.get('stats', {}).items():
+            self.ranking.update(user_id, stats.level, stats.xp)
+
+    async def save_db(self, permanent: bool = False) -> SaveReport:
+        """ Every write is already in the database, saving folds the WAL back into
+            the main file, or takes a timestamped backup when permanent
+        """
+        started: float = time.perf_counter()
+        # Cleared first, so writes landing during the save still count for the next one
+        self._unsaved = False
+        try:
+            if permanent:
+                folder_path = Path(self.database_settings.save_folder)
+                folder_path.mkdir(parents=True, exist_ok=True)
+                stem, suffix = Path(self.database_settings.sqlite_filename).stem, Path(self.database_settings.sqlite_filename).suffix
+                filepath: Path = folder_path / f"{stem}_{int(time.time())}{suffix}"
+                size: int = await self.database.backup(filepath)
+                kind: str = "full"
+            else:
+                await self.database.checkpoint()
+                filepath: Path = self.database.filepath
+                size: int = filepath.stat().st_size
+                kind: str = "checkpoint"
+        except Exception:
+            self._unsaved = True
+            raise
+
+        report = SaveReport(
+            kind=kind,
+            filepath=str(filepath),
+            size_bytes=size,
+            duration_seconds=time.perf_counter() - started
+        )
+        LOGGER.info("Saved db (%s): %s bytes in %.3fs", report.kind, report.size_bytes, report.duration_seconds)
+        return report
+
+    def has_unsaved_changes(self) -> bool:
+        return self._unsaved
+
+    async def close(self) -> None:
+        # Leave everything in the main file, the WAL isn't needed to open it again
+        await self.database.checkpoint()
+        await asyncio.to_thread(self.database.close)
+        LOGGER.info("Closed SQLite database %s", self.database.filepath)
+
+    def load_db(self) -> bool:
+        if self.database.count_users() == 0:
+            # First start on SQLite, bring over the JSON snapshots once
+            migrate_json_snapshots(self.database_settings, self.database)
+
+        self._rebuild_ranking()
+        return self.database.count_users() > 0
+
+    def _rebuild_ranking(self) -> None:
+        stats: dict[str, Stats] = self.database.get_table('stats')
+        self.ranking.rebuild((user_id, entry.level, entry.xp) for user_id, entry in stats.items())
@@ -0,0 +1,300 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from .database import Database
+from .schema import Schema
+from ..API.model import (
+    User,
+    Stats,
+    Checkin,
+    GithubContributionDay
+)
+from ..Logging.logger import Logger
+
+LOGGER = Logger(__file__)
+
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    last_checkin_id TEXT,
+    github_name TEXT,
+    last_contribution_date TEXT,
+    last_contribution_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS stats (
+    user_id TEXT PRIMARY KEY,
+    xp INTEGER NOT NULL,
+    total_xp_needed INTEGER NOT NULL,
+    level INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkins (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    proof TEXT NOT NULL,
+    proof_type TEXT
+);
+CREATE INDEX IF NOT EXISTS checkins_user_date ON checkins (user_id, date);
+"""
+
+# Statements are kept as constants so sqlite3's statement cache reuses their prepared form
+SELECT_USER = """
+SELECT u.id, u.last_checkin_id, u.github_name, u.last_contribution_date, u.last_contribution_count,
+       c.user_id, c.date, c.proof, c.proof_type
+FROM users u LEFT JOIN checkins c ON c.id = u.last_checkin_id
+"""
+SELECT_USER_BY_ID = SELECT_USER + " WHERE u.id = ?"
+UPSERT_USER = """
+INSERT OR REPLACE INTO users (id, last_checkin_id, github_name, last_contribution_date, last_contribution_count)
+VALUES (?, ?, ?, ?, ?)
+"""
+SELECT_STATS = "SELECT user_id, xp, total_xp_needed, level FROM stats"
+SELECT_STATS_BY_ID = SELECT_STATS + " WHERE user_id = ?"
+UPSERT_STATS = "INSERT OR REPLACE INTO stats (user_id, xp, total_xp_needed, level) VALUES (?, ?, ?, ?)"
+SELECT_CHECKINS = "SELECT id, user_id, date, proof, proof_type FROM checkins"
+SELECT_CHECKIN_BY_ID = SELECT_CHECKINS + " WHERE id = ?"
+UPSERT_CHECKIN = "INSERT OR REPLACE INTO checkins (id, user_id, date, proof, proof_type) VALUES (?, ?, ?, ?, ?)"
+SELECT_USER_CHECKINS = SELECT_CHECKINS + " WHERE user_id = ? ORDER BY date DESC LIMIT ? OFFSET ?"
+COUNT_USER_CHECKINS = "SELECT COUNT(*) FROM checkins WHERE user_id = ?"
+COUNT_USERS = "SELECT COUNT(*) FROM users"
+SELECT_USER_IDS = "SELECT id FROM users"
+HAS_USER = "SELECT EXISTS (SELECT 1 FROM users u JOIN stats s ON s.user_id = u.id WHERE u.id = ?)"
+
+
+class SqliteDatabase(Database):
+    """ Database stored in an SQLite file in WAL mode.
+        The connection lives on one dedicated thread, which runs work in order
+        so reads always see earlier writes. Commands await that work through
+        the *_async methods, the synchronous Database methods block and are
+        meant for startup and migration. A failed write raises either way.
+    """
+
+    TABLES = ['users', 'stats', 'checkins']
+
+    def __init__(self, name: str, filepath: Path):
+        self.name = name
+        self.filepath = Path(filepath)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sqlite-{name}")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._closed: bool = False
+        self._call(self._connect)
+
+    def _connect(self) -> None:
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit, explicit transactions are opened for bulk work
+        self._connection = sqlite3.connect(self.filepath, isolation_level=None, cached_statements=64)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA_SQL)
+        LOGGER.info("Opened SQLite database %s", self.filepath)
+
+    def _call(self, fn: Callable, *args) -> Any:
+        """ Run on the database thread and wait for the result
+        """
+        return self._executor.submit(fn, *args).result()
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        """ Await work on the database thread without blocking the event loop
+        """
+        return await asyncio.wrap_future(self._executor.submit(fn, *args))
+
+    def get_record(self, table: str, key: Any) -> Any:
+        record = self._call(self._get_record, table, key)
+        if record is None:
+            raise KeyError(f"Key '{key}' not in table '{table}'")
+        return record
+
+    async def get_record_async(self, table: str, key: Any) -> Any:
+        record = await self._run(self._get_record, table, key)
+        if record is None:
+            raise KeyError(f"Key '{key}' not in table '{table}'")
+        return record
+
+    def set_record(self, table: str, key: Any, data: Any) -> None:
+        row: tuple = self._to_row(table, key, data)
+        self._call(self._set_row, table, row)
+
+    def set_records(self, changes: dict[str, dict[Any, Any]]) -> None:
+        self._call(self._write_rows, self._to_rows(changes))
+
+    async def set_records_async(self, changes: dict[str, dict[Any, Any]]) -> None:
+        """ Returns once the transaction is committed
+        """
+        await self._run(self._write_rows, self._to_rows(changes))
+
+    def get_table(self, table: str) -> dict:
+        return self._call(self._get_table, table)
+
+    def get_table_names(self) -> list[str]:
+        return list(self.TABLES)
+
+    def get_schema(self) -> Schema:
+        return Schema.model_construct(**{table: self.get_table(table) for table in self.TABLES})
+
+    def count_users(self) -> int:
+        return self._call(lambda: self._connection.execute(COUNT_USERS).fetchone()[0])
+
+    async def has_user(self, user_id: str) -> bool:
+        return bool(await self._run(lambda: self._connection.execute(HAS_USER, (user_id,)).fetchone()[0]))
+
+    def get_user_ids(self) -> list[str]:
+        return self._call(lambda: [row[0] for row in self._connection.execute(SELECT_USER_IDS)])
+
+    async def get_user_checkins(self, user_id: str, limit: int, offset: int) -> list[Checkin]:
+        """ A user's checkins newest first, served from the (user_id, date) index
+        """
+        def _select() -> list[Checkin]:
+            rows = self._connection.execute(SELECT_USER_CHECKINS, (user_id, limit, offset))
+            return [self._checkin_from_row(row[1:]) for row in rows]
+
+        return await self._run(_select)
+
+    async def count_user_checkins(self, user_id: str) -> int:
+        return await self._run(lambda: self._connection.execute(COUNT_USER_CHECKINS, (user_id,)).fetchone()[0])
+
+    def import_schema(self, schema: Schema) -> None:
+        """ Bulk load every record of `schema` in a single transaction
+        """
+        rows: dict[str, list[tuple]] = {
+            table: [self._to_row(table, key, data) for key, data in getattr(schema, table).items()]
+            for table in self.TABLES
+        }
+        self._call(self._write_rows, rows)
+
+    async def checkpoint(self) -> None:
+        """ Fold the WAL back into the main database file
+        """
+        await self._run(lambda: self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)"))
+
+    async def backup(self, filepath: Path) -> int:
+        """ Consistent online copy of the database, returns its size in bytes
+        """
+        def _backup() -> int:
+            target = sqlite3.connect(filepath)
+            try:
+                self._connection.backup(target)
+            finally:
+                target.close()
+            return Path(filepath).stat().st_size
+
+        return await self._run(_backup)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+
+        def _close() -> None:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+        self._call(_close)
+        self._executor.shutdown(wait=True)
+        self._closed = True
+
+    # --- database thread only ---
+
+    def _get_record(self, table: str, key: Any) -> Any:
+        if table == 'users':
+            row = self._connection.execute(SELECT_USER_BY_ID, (key,)).fetchone()
+            return self._user_from_row(row) if row else None
+        if table == 'stats':
+            row = self._connection.execute(SELECT_STATS_BY_ID, (key,)).fetchone()
+            return self._stats_from_row(row) if row else None
+        if table == 'checkins':
+            row = self._connection.execute(SELECT_CHECKIN_BY_ID, (key,)).fetchone()
+            return self._checkin_from_row(row[1:]) if row else None
+        raise KeyError(f"Table '{table}' not in db. Available tables: {self.TABLES}")
+
+    def _get_table(self, table: str) -> dict:
+        if table == 'users':
+            return {row[0]: self._user_from_row(row) for row in self._connection.execute(SELECT_USER)}
+        if table == 'stats':
+            return {row[0]: self._stats_from_row(row) for row in self._connection.execute(SELECT_STATS)}
+        if table == 'checkins':
+            return {row[0]: self._checkin_from_row(row[1:]) for row in self._connection.execute(SELECT_CHECKINS)}
+        raise KeyError(f"Table '{table}' not in db. Available tables: {self.TABLES}")
+
+    def _set_row(self, table: str, row: tuple) -> None:
+        self._connection.execute(self._upsert_sql(table), row)
+
+    def _write_rows(self, rows: dict[str, list[tuple]]) -> None:
+        self._connection.execute("BEGIN")
+        try:
+            for table, table_rows in rows.items():
+                self._connection.executemany(self._upsert_sql(table), table_rows)
+            self._connection.execute("COMMIT")
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    # --- row mapping ---
+
+    @staticmethod
+    def _upsert_sql(table: str) -> str:
+        return {'users': UPSERT_USER, 'stats': UPSERT_STATS, 'checkins': UPSERT_CHECKIN}[table]
+
+    @staticmethod
+    def _to_rows(changes: dict[str, dict[Any, Any]]) -> dict[str, list[tuple]]:
+        return {
+            table: [SqliteDatabase._to_row(table, key, data) for key, data in records.items()]
+            for table, records in changes.items()
+        }
+
+    @staticmethod
+    def _to_row(table: str, key: Any, data: Any) -> tuple:
+        if table == 'users':
+            user: User = User.model_validate(data)
+            contribution = user.last_github_contribution
+            return (
+                key,
+                user.last_checkin_id,
+                user.github_name,
+                contribution.date.isoformat() if contribution else None,
+                contribution.count if contribution else None
+            )
+        if table == 'stats':
+            stats: Stats = Stats.model_validate(data)
+            return (key, stats.xp, stats.total_xp_needed, stats.level)
+        if table == 'checkins':
+            checkin: Checkin = Checkin.model_validate(data)
+            return (
+                key,
+                checkin.user_id,
+                checkin.date.isoformat(),
+                checkin.proof,
+                checkin.proof_type.value if checkin.proof_type else None
+            )
+        raise KeyError(f"Table '{table}' not in db. Available tables: {SqliteDatabase.TABLES}")
+
+    @staticmethod
+    def _user_from_row(row: tuple) -> User:
+        user_id, last_checkin_id, github_name, contribution_date, contribution_count = row[:5]
+        return User(
+            id=user_id,
+            last_checkin_id=last_checkin_id,
+            last_checkin=SqliteDatabase._checkin_from_row(row[5:]) if row[5] is not None else None,
+            github_name=github_name,
+            last_github_contribution=GithubContributionDay(
+                date=contribution_date,
+                count=contribution_count
+            ) if contribution_date else None
+        )
+
+    @staticmethod
+    def _stats_from_row(row: tuple) -> Stats:
+        return Stats(xp=row[1], total_xp_needed=row[2], level=row[3])
+
+    @staticmethod
+    def _checkin_from_row(row: tuple) -> Checkin:
+        user_id, date, proof, proof_type = row
+        return Checkin(
+            user_id=user_id,
+            date=date,
+            proof=proof,
+            proof_type=proof_type
+        )
@@ -0,0 +1,27 @@
+from .in_memory_database_facade import InMemoryDatabaseFacade
+from .in_memory_db import InMemoryDatabase
+from .sqlite_db import SqliteDatabase
+from .model import DatabaseSettings
+from ..Logging.logger import Logger
+
+LOGGER = Logger(__file__)
+
+
+def migrate_json_snapshots(database_settings: DatabaseSettings, database: SqliteDatabase) -> bool:
+    """ One-shot import of the JSON snapshots (plus deltas and journal) in
+        save_folder into `database`. True if anything was imported.
+    """
+    source = InMemoryDatabase("migration")
+    source_facade = InMemoryDatabaseFacade(source, database_settings)
+
+    if not source_facade.load_db():
+        LOGGER.debug("No JSON snapshots in %s to migrate", database_settings.save_folder)
+        return False
+
+    schema = source.get_schema()
+    database.import_schema(schema)
+    LOGGER.info(
+        "Migrated %s users, %s stats and %s checkins from JSON snapshots into %s",
+        len(schema.users), len(schema.stats), len(schema.checkins), database.filepath
+    )
+    return True
@@ -0,0 +1,70 @@
+from typing import Any, TYPE_CHECKING
+
+from ..API.model import (
+    Stats,
+    User,
+    Checkin
+)
+from ..API.leveling import LevelCurve
+from ..Logging.logger import Logger
+
+if TYPE_CHECKING:
+    from .database_facade import DatabaseFacade
+
+LOGGER = Logger(__file__)
+
+
+class UnitOfWork:
+    """ Working copies of the records one command touches.
+        Each record is read from the store at most once and can be mutated
+        freely. Records passed to put() are written together on commit,
+        and nothing is written if the command fails before that.
+    """
+
+    def __init__(self, database_facade: "DatabaseFacade"):
+        self.database_facade = database_facade
+        self._records: dict[tuple[str, Any], Any] = {}
+        self._changes: dict[str, dict[Any, Any]] = {}
+
+    async def get(self, table: str, key: Any) -> Any:
+        if (table, key) not in self._records:
+            self._records[(table, key)] = await self.database_facade.read_record(table, key)
+        return self._records[(table, key)]
+
+    def put(self, table: str, key: Any, record: Any) -> None:
+        self._records[(table, key)] = record
+        self._changes.setdefault(table, {})[key] = record
+
+    async def get_user(self, user_id: str) -> User:
+        return await self.get('users', user_id)
+
+    async def get_stats(self, user_id: str) -> Stats:
+        return await self.get('stats', user_id)
+
+    def add_checkin(self, checkin: Checkin) -> str:
+        new_checkin_id: str = self.database_facade.new_checkin_id()
+        self.put('checkins', new_checkin_id, checkin)
+        return new_checkin_id
+
+    async def give_xp(self, user_id: str, amount: int) -> bool:
+        """ True if the user reached at least one new level, extra xp carries over
+        """
+        stats: Stats = await self.get_stats(user_id)
+        curve: LevelCurve = self.database_facade.level_curve
+
+        old_level: int = stats.level
+        stats.level, stats.xp = curve.apply(stats.level, stats.xp, amount)
+        stats.total_xp_needed = curve.xp_to_next_level(stats.level)
+
+        self.put('stats', user_id, stats)
+        return stats.level > old_level
+
+    async def commit(self) -> None:
+        """ Returns once the write is stored, a failed write raises here
+        """
+        if not self._changes:
+            return
+
+        changes, self._changes = self._changes, {}
+        await self.database_facade.write_records(changes)
+        LOGGER.debug("Committed %s records", sum(len(records) for records in changes.values()))
@@ -8,44 +8,70 @@ from dotenv import load_dotenv
 
 from ..Logging.logger import Logger
 from ..API.koda import Koda
+from ..API.guild_partitions import GuildPartitions
+from ..API.leveling import LevelCurve
 from ..API.model import (
     Stats,
     User,
     Checkin,
+    CheckinHistoryPage,
+    CheckinResult,
+    LeaderboardEntry,
+    XpGrantResult,
     ProofType
 )
-from ..API.exceptions import LackOfContributionError
+from ..API.exceptions import (
+    LackOfContributionError,
+    GithubUserNotFoundError,
+    GithubRateLimitError
+)
+from .dispatcher import MessageDispatcher
 
 
 load_dotenv()
 ADMIN_ID = int(os.environ.get('ADMIN_ID'))
 LEVELUP_CHANNEL_ID = int(os.environ.get('LEVEL_UP_ANNOUNCEMENTS'))
 
-LOGGER = Logger(__file__, "debug")
+LOGGER = Logger(__file__)
 
 
 class CommandParser:
 
-    def __init__(self, command_prefix: str, koda_api: Koda):
+    def __init__(
+        self,
+        command_prefix: str,
+        partitions: GuildPartitions,
+        dispatcher: Optional[MessageDispatcher] = None,
+        templates_dir_path: str = "templates"
+    ):
         self.prefix = command_prefix
         self.actions = {
             "?": self.help,
             "stats": self.get_stats,
             "checkin": self.checkin,
             "register": self.register,
+            "history": self.history,
+            "top": self.top,
+            "rank": self.rank,
             "savedb": self.save_db, # Admin
+            "ratelimit": self.rate_limit, # Admin
+            "grantxp": self.grant_xp, # Admin
+            "queue": self.queue_depth, # Admin
 
             # UNIMPLEMENTED
             # "clear": self.clear_user,
         }
-        self.api = koda_api
+        self.partitions = partitions
+        self.dispatcher = dispatcher or MessageDispatcher()
+        # Help is the same everywhere, reading it shouldn't open a guild's partition
+        self.templates: dict[str, str] = Koda.load_templates(templates_dir_path)
 
     def is_command(self, message: str) -> bool:
         return (message[:len(self.prefix)+1] == self.prefix + ' ')
     
     async def parse_command(self, message: Message) -> None:
         command: str = message.content[len(self.prefix):].split()
-        LOGGER.debug(f"Command after splitting: {command}")
+        LOGGER.debug("Command after splitting: %s", command)
         
         if len(command) < 1:
             LOGGER.debug("Command has no arguments")
@@ -53,24 +79,30 @@ class CommandParser:
 
         action: str = command[0]
         if action in self.actions:
-            LOGGER.debug(f"Action detected: {action}")
+            LOGGER.debug("Action detected: %s", action)
             await self.actions[action](message, command)
         
         else:
             LOGGER.debug("Command not recognized")
 
+    def _api(self, message: Message) -> Koda:
+        """ Stats, checkins and leaderboards are kept per guild
+        """
+        return self.partitions.get(message.guild.id if message.guild else None)
+
     async def help(self, message: Message, command: list[str]) -> None:
         LOGGER.debug("It's a help command")
-        response_message:str = self.api.get_help_text()
+        response_message:str = self.templates['help.txt']
         dm_channel = await message.author.create_dm()
-        await dm_channel.send(response_message)
+        self.dispatcher.reply(dm_channel, response_message)
 
-    async def get_stats(self, message: Message, command: list[str], channel: Optional['GuildChannel']=None) -> None:
+    async def get_stats(self, message: Message, command: list[str]) -> None:
         LOGGER.debug("It's a stats command")
 
-        self._handle_new_user_case(message)
+        api: Koda = self._api(message)
+        await self._handle_new_user_case(api, message)
 
-        stats: Stats = self.api.get_stats(str(message.author.id))
+        stats: Stats = await api.get_stats(str(message.author.id))
 
         # Discord embed makes a nice box around the content
         embed = discord.Embed(
@@ -99,10 +131,7 @@ class CommandParser:
         # embed.set_footer(text="Generated by your bot")
         # embed.set_thumbnail(url="https://example.com/some_icon.png")  # Optional image in corner
 
-        if channel:
-            await channel.send(embed=embed)
-        else:
-            await message.channel.send(embed=embed)
+        self.dispatcher.reply(message.channel, embed=embed)
 
     def _number_to_emoji(self, num: int) -> str:
         digit_map = {
@@ -135,11 +164,12 @@ class CommandParser:
         expected_command_length: int = 1
         command_length: int = len(command)
         if command_length < expected_command_length:
-            LOGGER.debug(f"Command not long enough: expected {expected_command_length}, received {command_length}")
-            await message.channel.send("I don't understand. Say `koda ?` for help.")
+            LOGGER.debug("Command not long enough: expected %s, received %s", expected_command_length, command_length)
+            self.dispatcher.reply(message.channel, "I don't understand. Say `koda ?` for help.")
             return
 
-        self._handle_new_user_case(message)
+        api: Koda = self._api(message)
+        await self._handle_new_user_case(api, message)
 
         checkin: Checkin = Checkin(
             user_id=str(message.author.id),
@@ -149,24 +179,35 @@ class CommandParser:
         )
 
         try:
-            remaining_cooldown: Optional[timedelta] = self.api.checkin(str(message.author.id), checkin)
-            if remaining_cooldown:
-                cooldown_str: str = self._format_timedelta(remaining_cooldown)
-                await message.channel.send(f"You already checked in today. Cooldown: {cooldown_str}")
+            result: CheckinResult = await api.checkin(str(message.author.id), checkin)
+            if result.cooldown:
+                cooldown_str: str = self._format_timedelta(result.cooldown)
+                self.dispatcher.reply(message.channel, f"You already checked in today. Cooldown: {cooldown_str}")
             else:
-                xp_reward: int = 500
-                leveled_up: bool = self.api.give_xp(str(message.author.id), xp_reward)
-                await message.channel.send(f"Check in confirmed :star: +{xp_reward} xp")
+                self.dispatcher.reply(message.channel, f"Check in confirmed :star: +{result.xp_awarded} xp")
                 
-                if leveled_up:
-                    channel = message.guild.get_channel(LEVELUP_CHANNEL_ID)
-                    await channel.send(
-                        f"@everyone 📢 {message.author.mention} has leveled up! :partying_face:"
+                if result.leveled_up:
+                    stats: Stats = await api.get_stats(str(message.author.id))
+                    self.dispatcher.announce_level_ups(
+                        self._level_up_channel(message),
+                        [XpGrantResult(
+                            user_id=str(message.author.id),
+                            amount=result.xp_awarded,
+                            level=stats.level,
+                            xp=stats.xp,
+                            leveled_up=True
+                        )]
                     )
-                    await self.get_stats(message, command, channel)
         
         except LackOfContributionError:
-            await message.channel.send(f"You haven't contributed since your last checkin :face_with_raised_eyebrow:")
+            self.dispatcher.reply(message.channel, f"You haven't contributed since your last checkin :face_with_raised_eyebrow:")
+
+        except GithubUserNotFoundError:
+            self.dispatcher.reply(message.channel, f"I couldn't find your GitHub account. Say `koda register <github username>` to fix it.")
+
+        except GithubRateLimitError as e:
+            cooldown_str: str = self._format_timedelta(e.retry_after)
+            self.dispatcher.reply(message.channel, f"GitHub is busy right now, try checking in again in {cooldown_str}")
 
     def _format_timedelta(self, td: timedelta) -> str:
         total_seconds = int(td.total_seconds())
@@ -191,42 +232,197 @@ class CommandParser:
         expected_command_length: int = 2
         command_length: int = len(command)
         if command_length < expected_command_length:
-            LOGGER.debug(f"Command not long enough: expected {expected_command_length}, received {command_length}")
-            await message.channel.send("I don't understand. Say `koda ?` for help.")
+            LOGGER.debug("Command not long enough: expected %s, received %s", expected_command_length, command_length)
+            self.dispatcher.reply(message.channel, "I don't understand. Say `koda ?` for help.")
             return
         
-        self._handle_new_user_case(message)
+        api: Koda = self._api(message)
+        await self._handle_new_user_case(api, message)
+
+        await api.register_github_name(str(message.author.id), command[1])
+        self.dispatcher.reply(message.channel, f"I registered your GitHub username as {command[1]} :white_check_mark:")
+
+    async def history(self, message: Message, command: list[str]) -> None:
+        LOGGER.debug("It's a history command")
+
+        page: int = 1
+        if len(command) > 1:
+            if not command[1].isdigit() or int(command[1]) < 1:
+                self.dispatcher.reply(message.channel, "I don't understand. Say `koda ?` for help.")
+                return
+            page = int(command[1])
+
+        api: Koda = self._api(message)
+        await self._handle_new_user_case(api, message)
+
+        history: CheckinHistoryPage = await api.get_checkin_history(str(message.author.id), page)
+
+        embed = discord.Embed(
+            title=message.author.display_name,
+            description=f"📅 Checkin history ({history.total_checkins} total)",
+            color=discord.Color.red()
+        )
+        for checkin in history.checkins:
+            embed.add_field(
+                name=checkin.date.strftime("%Y-%m-%d %H:%M"),
+                value=self._checkin_summary(checkin),
+                inline=False
+            )
+        if not history.checkins:
+            embed.add_field(name="Nothing here", value="No checkins on this page", inline=False)
+        embed.set_footer(text=f"Page {history.page}/{history.total_pages}")
+
+        self.dispatcher.reply(message.channel, embed=embed)
+
+    async def top(self, message: Message, command: list[str]) -> None:
+        LOGGER.debug("It's a top command")
+
+        count: int = 10
+        if len(command) > 1:
+            if not command[1].isdigit() or int(command[1]) < 1:
+                self.dispatcher.reply(message.channel, "I don't understand. Say `koda ?` for help.")
+                return
+            # Embeds hold at most 25 fields
+            count = min(int(command[1]), 25)
+
+        leaderboard: list[LeaderboardEntry] = self._api(message).get_leaderboard(count)
+
+        embed = discord.Embed(
+            title="Leaderboard",
+            description=f"🏆 Top {count}",
+            color=discord.Color.red()
+        )
+        for entry in leaderboard:
+            embed.add_field(
+                name=f"#{entry.rank}",
+                value=f"<@{entry.user_id}> Level {entry.level} ({entry.xp} xp)",
+                inline=False
+            )
+        if not leaderboard:
+            embed.add_field(name="Nothing here", value="Nobody has any xp yet", inline=False)
 
-        self.api.register_github_name(str(message.author.id), command[1])
-        await message.channel.send(f"I registered your GitHub username as {command[1]} :white_check_mark:")
+        self.dispatcher.reply(message.channel, embed=embed)
+
+    async def rank(self, message: Message, command: list[str]) -> None:
+        LOGGER.debug("It's a rank command")
+
+        api: Koda = self._api(message)
+        await self._handle_new_user_case(api, message)
+
+        entry: Optional[LeaderboardEntry] = await api.get_rank(str(message.author.id))
+        if entry is None:
+            self.dispatcher.reply(message.channel, "You're not ranked yet, you have no xp")
+            return
+        self.dispatcher.reply(message.channel, f"You are ranked #{entry.rank} at Level {entry.level} ({entry.xp} xp)")
+
+    def _checkin_summary(self, checkin: Checkin, max_length: int = 100) -> str:
+        if checkin.proof_type == ProofType.Contribution:
+            return f"GitHub contribution ({checkin.proof})"
+        if checkin.proof_type == ProofType.Note:
+            proof: str = checkin.proof
+            return proof if len(proof) <= max_length else proof[:max_length - 1] + "…"
+        return "No proof"
 
     async def clear_user(self, message: Message, command: list[str]) -> None:
         LOGGER.debug("It's a clear command")
         raise NotImplementedError("UNIMPLEMENTED COMMAND")
     
-    def _handle_new_user_case(self, message: Message) -> None:
-        if self.api.new_user_detected(str(message.author.id)):
-            author: discord.User = message.author
+    def _level_up_channel(self, message: Message) -> Optional[discord.abc.Messageable]:
+        """ The announcements channel only exists in its own guild,
+            other guilds and DMs get their level-ups where the command was sent
+        """
+        if message.guild is not None:
+            channel: Optional[discord.abc.GuildChannel] = message.guild.get_channel(LEVELUP_CHANNEL_ID)
+            if channel is not None:
+                return channel
+        return message.channel
+
+    async def _handle_new_user_case(self, api: Koda, message: Message) -> None:
+        await self._establish_user(api, message.author)
+
+    async def _establish_user(self, api: Koda, author: discord.User) -> None:
+        if await api.new_user_detected(str(author.id)):
             user: User = User(
                 id=str(author.id)
             )
-            self.api.establish_new_user(user)
-            LOGGER.info(f"New user established: {user.model_dump_json()}")
+            await api.establish_new_user(user)
+            LOGGER.info("New user established: %s", user.model_dump_json())
 
     async def save_db(self, message: Message, command: list[str]) -> None:
         if message.author.id == ADMIN_ID:
             LOGGER.warn("[ADMIN] save db command issued by admin")
-            self.api.save_db(permanent=True)
-            await message.channel.send("Database has been saved :white_check_mark:")
+            reports = await self.partitions.save_all(permanent=True)
+            self.dispatcher.reply(
+                message.channel,
+                f"Database has been saved :white_check_mark: "
+                f"({len(reports)} guilds, {sum(report.size_bytes for report in reports.values())} bytes, "
+                f"slowest {max((report.duration_seconds for report in reports.values()), default=0):.2f}s)"
+            )
 
         else:
             LOGGER.warn("[BREACH] save db command issued by non-admin")
 
+    async def rate_limit(self, message: Message, command: list[str]) -> None:
+        if message.author.id == ADMIN_ID:
+            LOGGER.warn("[ADMIN] rate limit command issued by admin")
+            api: Koda = self._api(message)
+            state = api.get_github_rate_limit()
+            cache = api.get_github_cache_stats()
+            self.dispatcher.reply(
+                message.channel,
+                f"GitHub budget: {state.remaining}/{state.limit}, "
+                f"resets at {state.reset_at}, paused until {state.paused_until}, last cost {state.last_cost}, "
+                f"queued: {state.queued_interactive} interactive / {state.queued_background} background\n"
+                f"Contribution cache: {cache.hits} hits / {cache.misses} misses, "
+                f"{cache.size} entries, {cache.evictions} evictions"
+            )
+
+        else:
+            LOGGER.warn("[BREACH] rate limit command issued by non-admin")
+
+    async def grant_xp(self, message: Message, command: list[str]) -> None:
+        if message.author.id != ADMIN_ID:
+            LOGGER.warn("[BREACH] grant xp command issued by non-admin")
+            return
+
+        LOGGER.warn("[ADMIN] grant xp command issued by admin")
+        recipients: list[discord.User] = [user for user in message.mentions if not user.bot]
+        valid_amount: bool = len(command) >= 3 and command[1].isdigit() and 1 <= int(command[1]) <= LevelCurve.MAX_GRANT
+        if not valid_amount or not recipients:
+            self.dispatcher.reply(message.channel, f"Usage: `koda grantxp <1-{LevelCurve.MAX_GRANT}> @user [@user ...]`")
+            return
+
+        amount: int = int(command[1])
+        api: Koda = self._api(message)
+        for recipient in recipients:
+            await self._establish_user(api, recipient)
+
+        results: list[XpGrantResult] = await api.give_xp_bulk({str(user.id): amount for user in recipients})
+        self.dispatcher.reply(message.channel, f"Granted {amount} xp to {len(results)} users :star:")
+
+        leveled_up: list[XpGrantResult] = [result for result in results if result.leveled_up]
+        if leveled_up:
+            self.dispatcher.announce_level_ups(self._level_up_channel(message), leveled_up)
+
+    async def queue_depth(self, message: Message, command: list[str]) -> None:
+        if message.author.id == ADMIN_ID:
+            LOGGER.warn("[ADMIN] queue command issued by admin")
+            state = self.dispatcher.state()
+            self.dispatcher.reply(
+                message.channel,
+                f"Outbound queue: {state.queued_replies} replies / {state.queued_announcements} announcements, "
+                f"{state.pending_level_ups} level-ups waiting to be announced, "
+                f"busiest channel {state.busiest_channel_id} with {state.busiest_channel_depth} queued"
+            )
+
+        else:
+            LOGGER.warn("[BREACH] queue command issued by non-admin")
+
     async def ephemeral_auto_save_db(self) -> None:
         LOGGER.debug("Autosaving DB for short term")
-        self.api.save_db()
+        await self.partitions.save_all()
 
     async def permanent_auto_save_db(self) -> None:
         LOGGER.info("Autosaving DB for long term")
-        self.api.save_db(permanent=True)
+        await self.partitions.save_all(permanent=True)
     
\ No newline at end of file
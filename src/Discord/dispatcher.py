@@ -0,0 +1,162 @@
+import asyncio
+import itertools
+from enum import IntEnum
+from typing import Optional
+
+import discord
+
+from ..Logging.logger import Logger
+from ..API.model import (
+    DispatcherSettings,
+    DispatcherState,
+    XpGrantResult
+)
+
+LOGGER = Logger(__file__)
+
+
+class MessagePriority(IntEnum):
+    # Lower value is sent first
+    Reply = 0
+    Announcement = 1
+
+
+class MessageDispatcher:
+    """ Outbound messages wait in a priority queue per channel and each
+        channel sends one message at a time. A channel held back by Discord's
+        rate limit only delays its own queue, and replies queued behind it
+        still go out before announcements. Level-ups arriving within
+        `level_up_window` of each other are merged into one announcement.
+    """
+
+    def __init__(self, settings: DispatcherSettings = DispatcherSettings()):
+        self.settings = settings
+        self._queues: dict[int, asyncio.PriorityQueue] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        self._level_ups: dict[int, dict[str, XpGrantResult]] = {} # channel id -> user id -> latest level-up
+        self._level_up_timers: dict[int, asyncio.TimerHandle] = {}
+        self._channels: dict[int, discord.abc.Messageable] = {}
+        self._sequence = itertools.count() # keeps each priority in order of arrival
+        self._queued: dict[MessagePriority, int] = {priority: 0 for priority in MessagePriority}
+
+    def reply(self, channel: discord.abc.Messageable, content: Optional[str] = None, embed: Optional[discord.Embed] = None) -> None:
+        self._enqueue(channel, MessagePriority.Reply, content, embed)
+
+    def announce(self, channel: discord.abc.Messageable, content: Optional[str] = None, embed: Optional[discord.Embed] = None) -> None:
+        self._enqueue(channel, MessagePriority.Announcement, content, embed)
+
+    def announce_level_ups(self, channel: Optional[discord.abc.Messageable], results: list[XpGrantResult]) -> None:
+        """ Announced together with any other level-ups in the channel once the window closes.
+            Skipped without a channel to announce in
+        """
+        if channel is None:
+            LOGGER.warn("No channel to announce %s level-ups in, skipping", len(results))
+            return
+
+        pending: dict[str, XpGrantResult] = self._level_ups.setdefault(channel.id, {})
+        for result in results:
+            pending[result.user_id] = result
+
+        if channel.id not in self._level_up_timers:
+            self._channels[channel.id] = channel
+            self._level_up_timers[channel.id] = asyncio.get_running_loop().call_later(
+                self.settings.level_up_window, self._close_level_up_window, channel.id
+            )
+
+    def state(self) -> DispatcherState:
+        depths: dict[int, int] = {channel_id: queue.qsize() for channel_id, queue in self._queues.items()}
+        busiest: Optional[int] = max(depths, key=depths.get) if depths else None
+        return DispatcherState(
+            queued_replies=self._queued[MessagePriority.Reply],
+            queued_announcements=self._queued[MessagePriority.Announcement],
+            pending_level_ups=sum(len(pending) for pending in self._level_ups.values()),
+            busiest_channel_id=busiest,
+            busiest_channel_depth=depths[busiest] if busiest is not None else 0
+        )
+
+    async def flush(self) -> None:
+        """ Announce pending level-ups now and wait until every queue is empty
+        """
+        for channel_id in list(self._level_up_timers):
+            self._level_up_timers[channel_id].cancel()
+            self._close_level_up_window(channel_id)
+        while self._workers:
+            await asyncio.gather(*self._workers.values())
+
+    def _close_level_up_window(self, channel_id: int) -> None:
+        self._level_up_timers.pop(channel_id, None)
+        results: list[XpGrantResult] = list(self._level_ups.pop(channel_id, {}).values())
+        channel: discord.abc.Messageable = self._channels[channel_id]
+        for content, embed in level_up_messages(results):
+            self.announce(channel, content, embed)
+
+    def _enqueue(
+        self,
+        channel: discord.abc.Messageable,
+        priority: MessagePriority,
+        content: Optional[str],
+        embed: Optional[discord.Embed]
+    ) -> None:
+        queue: Optional[asyncio.PriorityQueue] = self._queues.get(channel.id)
+        if queue is None:
+            queue = self._queues[channel.id] = asyncio.PriorityQueue()
+        queue.put_nowait((priority, next(self._sequence), content, embed))
+        self._queued[priority] += 1
+        self._channels[channel.id] = channel
+
+        if channel.id not in self._workers:
+            self._workers[channel.id] = asyncio.get_running_loop().create_task(self._drain(channel.id))
+        LOGGER.debug("Queued %s for channel %s, %s waiting", priority.name, channel.id, queue.qsize())
+
+    async def _drain(self, channel_id: int) -> None:
+        """ Send the channel's messages in priority order, the worker exits once the queue is empty
+        """
+        queue: asyncio.PriorityQueue = self._queues[channel_id]
+        channel: discord.abc.Messageable = self._channels[channel_id]
+        try:
+            while not queue.empty():
+                priority, _, content, embed = queue.get_nowait()
+                self._queued[priority] -= 1
+                try:
+                    # discord.py waits out the channel's rate limit inside send()
+                    await channel.send(content, embed=embed)
+                except Exception as e:
+                    LOGGER.error("Failed to send %s to channel %s: %r", priority.name, channel_id, e)
+        finally:
+            # Nothing awaits between the empty check and here, so no message is stranded
+            del self._workers[channel_id]
+            if queue.empty():
+                del self._queues[channel_id]
+                if channel_id not in self._level_up_timers:
+                    self._channels.pop(channel_id, None)
+
+
+def level_up_messages(results: list[XpGrantResult]) -> list[tuple[str, Optional[discord.Embed]]]:
+    """ One announcement for many level-ups instead of one message and embed each
+    """
+    if not results:
+        return []
+    mentions: list[str] = [f"<@{result.user_id}>" for result in results]
+
+    # Discord messages are capped at 2000 characters
+    lines: list[str] = []
+    line: str = "@everyone 📢"
+    for mention in mentions:
+        if len(line) + len(mention) + 40 > 2000:
+            lines.append(line)
+            line = ""
+        line += f" {mention}"
+    lines.append(line + (" has leveled up! :partying_face:" if len(results) == 1 else " leveled up! :partying_face:"))
+
+    embed = discord.Embed(
+        title="Level ups",
+        description=f"🎉 {len(results)} users reached a new level" if len(results) > 1 else "🎉 Reached a new level",
+        color=discord.Color.red()
+    )
+    # Embeds hold at most 25 fields
+    for result in results[:25]:
+        embed.add_field(name=f"Level {result.level}", value=f"<@{result.user_id}>", inline=True)
+    if len(results) > 25:
+        embed.set_footer(text=f"and {len(results) - 25} more")
+
+    return [(content, embed if index == len(lines) - 1 else None) for index, content in enumerate(lines)]
@@ -1,45 +1,75 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 import os
-from typing import Optional
+from typing import Any, Optional, TextIO
+
+LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warn": logging.WARN,
+    "error": logging.ERROR
+}
+FORMAT = "%(asctime)s [%(levelname)s][%(name)s]: %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """ Hands records over as they are, the stock handler formats them in the calling thread first
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(level: str = "info", stream: Optional[TextIO] = None) -> None:
+    """ Set the level for every Logger. Records go through a queue to a listener
+        thread, which does all formatting and writing. Calling it again only changes the level
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(LEVELS[level.lower().strip()])
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(stream or sys.stdout) # Send logs to stdout instead of stderr
+    handler.setFormatter(logging.Formatter(FORMAT))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    root.addHandler(_DeferredQueueHandler(records))
+
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    # Flushes whatever is still queued on exit
+    atexit.register(_listener.stop)
+
 
 class Logger:
+    """ Messages take %-style args, which are only formatted if the level is enabled,
+        and then on the listener thread. Args should not be mutated after logging
+    """
 
-    def __init__(self, name: str, level: str = "info", *, file: Optional[str] = None):
+    def __init__(self, name: str):
         if os.path.exists(name):
             name = os.path.basename(name)
-        levels = {
-            "debug": logging.DEBUG,
-            "info": logging.INFO,
-            "warn": logging.WARN,
-            "error": logging.ERROR
-        }
-        level = levels[level.lower().strip()]
-        format: str = "%(asctime)s [%(levelname)s][%(name)s]: %(message)s"
-
-        if file:
-            logging.basicConfig(
-                stream=file,
-                level=level,
-                format=format
-            )
-        else:
-            logging.basicConfig(
-                stream=sys.stdout,  # Send logs to stdout instead of stderr
-                level=level,
-                format=format
-            )
+        if _listener is None:
+            configure_logging()
 
         self.logger = logging.getLogger(name)
 
-    def info(self, log_message: str) -> None:
-        self.logger.info(log_message)
+    def is_enabled_for(self, level: str) -> bool:
+        return self.logger.isEnabledFor(LEVELS[level])
+
+    def info(self, log_message: str, *args: Any) -> None:
+        self.logger.info(log_message, *args)
+
+    def debug(self, log_message: str, *args: Any) -> None:
+        self.logger.debug(log_message, *args)
 
-    def debug(self, log_message: str) -> None:
-        self.logger.debug(log_message)
+    def warn(self, log_message: str, *args: Any) -> None:
+        self.logger.warning(log_message, *args)
 
-    def warn(self, log_message: str) -> None:
-        self.logger.warning(log_message)
-    
-    def error(self, log_message: str) -> None:
-        self.logger.error(log_message)
+    def error(self, log_message: str, *args: Any) -> None:
+        self.logger.error(log_message, *args)
@@ -0,0 +1,93 @@
+import asyncio
+import gc
+import unittest
+
+from src.API.concurrency import KeyedLocks, InFlightRequests
+
+
+class KeyedLocksTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_same_key_runs_in_order(self):
+        locks = KeyedLocks()
+        events: list[str] = []
+
+        async def work(name: str, key: str) -> None:
+            async with locks.lock(key):
+                events.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                events.append(f"{name} end")
+
+        await asyncio.gather(work("a", "x"), work("b", "x"), work("c", "y"))
+        self.assertLess(events.index("a end"), events.index("b start"))
+        # Another key doesn't wait
+        self.assertLess(events.index("c start"), events.index("a end"))
+
+    async def test_unused_locks_are_dropped(self):
+        locks = KeyedLocks()
+        async with locks.lock("x"):
+            self.assertEqual(len(locks), 1)
+        gc.collect()
+        self.assertEqual(len(locks), 0)
+
+    async def test_lock_all_in_any_order_does_not_deadlock(self):
+        locks = KeyedLocks()
+        held: list[int] = []
+
+        async def work(keys: list[str]) -> None:
+            async with locks.lock_all(keys):
+                held.append(len(keys))
+                await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(asyncio.gather(work(["a", "b"]), work(["b", "a"]), work(["b", "a", "b"])), 1.0)
+        self.assertEqual(sorted(held), [2, 2, 3])
+        self.assertFalse(locks.lock("a").locked())
+
+
+class InFlightRequestsTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_callers_share_one_request(self):
+        requests = InFlightRequests()
+        calls: list[str] = []
+
+        async def fetch() -> str:
+            calls.append("fetch")
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(requests.run("octocat", fetch) for _ in range(5)))
+        self.assertEqual(results, ["result"] * 5)
+        self.assertEqual(calls, ["fetch"])
+        self.assertEqual(len(requests), 0)
+
+        # Finished requests aren't reused
+        await requests.run("octocat", fetch)
+        self.assertEqual(len(calls), 2)
+
+    async def test_every_caller_gets_the_exception(self):
+        requests = InFlightRequests()
+
+        async def fetch() -> str:
+            await asyncio.sleep(0.01)
+            raise LookupError("not found")
+
+        results = await asyncio.gather(*(requests.run("ghost", fetch) for _ in range(3)), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, LookupError) for result in results))
+
+    async def test_cancelling_one_caller_leaves_the_others(self):
+        requests = InFlightRequests()
+
+        async def fetch() -> str:
+            await asyncio.sleep(0.02)
+            return "result"
+
+        first = asyncio.ensure_future(requests.run("octocat", fetch))
+        second = asyncio.ensure_future(requests.run("octocat", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        self.assertEqual(await second, "result")
+        self.assertTrue(first.cancelled())
+
+
+if __name__ == "__main__":
+    unittest.main()
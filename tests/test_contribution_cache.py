@@ -0,0 +1,56 @@
+import time
+import unittest
+from datetime import date
+
+from src.API.contribution_cache import ContributionCache
+from src.API.model import GithubContributionDay
+
+
+class ContributionCacheTest(unittest.TestCase):
+
+    def day(self, count: int) -> GithubContributionDay:
+        return GithubContributionDay(date=date(2024, 1, 1), count=count)
+
+    def test_hits_and_misses_are_counted(self):
+        cache = ContributionCache(ttl=60, max_size=10, negative_ttl=60)
+        self.assertIs(cache.get("octocat"), ContributionCache.MISS)
+        cache.put("octocat", self.day(3))
+        # Logins are case-insensitive
+        self.assertEqual(cache.get("OctoCat").count, 3)
+
+        stats = cache.stats()
+        self.assertEqual((stats.hits, stats.misses, stats.size), (1, 1, 1))
+
+    def test_no_contribution_and_unknown_logins_are_cached(self):
+        cache = ContributionCache(ttl=60, max_size=10, negative_ttl=60)
+        cache.put("quiet", None)
+        cache.put_not_found("ghost")
+        self.assertIsNone(cache.get("quiet"))
+        self.assertIs(cache.get("ghost"), ContributionCache.NOT_FOUND)
+
+    def test_entries_expire(self):
+        cache = ContributionCache(ttl=0.05, max_size=10, negative_ttl=60)
+        cache.put("octocat", self.day(1))
+        time.sleep(0.06)
+        self.assertIs(cache.get("octocat"), ContributionCache.MISS)
+        self.assertEqual(cache.stats().size, 0)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ContributionCache(ttl=60, max_size=2, negative_ttl=60)
+        cache.put("a", self.day(1))
+        cache.put("b", self.day(2))
+        cache.get("a")
+        cache.put("c", self.day(3))
+
+        self.assertIs(cache.get("b"), ContributionCache.MISS)
+        self.assertEqual(cache.get("a").count, 1)
+        self.assertEqual(cache.stats().evictions, 1)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = ContributionCache(ttl=60, max_size=0, negative_ttl=60)
+        cache.put("octocat", self.day(1))
+        self.assertIs(cache.get("octocat"), ContributionCache.MISS)
+
+
+if __name__ == "__main__":
+    unittest.main()
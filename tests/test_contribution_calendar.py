@@ -0,0 +1,47 @@
+import random
+import unittest
+from datetime import date, timedelta
+
+from src.API.model import ContributionCalendar, GithubContributionDay
+
+
+class ContributionCalendarTest(unittest.TestCase):
+
+    def calendar(self, counts: list[int], start: date = date(2024, 1, 1)) -> ContributionCalendar:
+        days = [GithubContributionDay(date=start + timedelta(days=i), count=count) for i, count in enumerate(counts)]
+        random.Random(6).shuffle(days)
+        return ContributionCalendar(days=days)
+
+    def test_days_are_indexed_by_date(self):
+        calendar = self.calendar([0, 3, 0, 5, 0])
+        self.assertEqual((calendar.start, calendar.end), (date(2024, 1, 1), date(2024, 1, 5)))
+        self.assertEqual(calendar.count_on(date(2024, 1, 4)), 5)
+        self.assertEqual(calendar.count_on(date(2023, 12, 31)), 0)
+        self.assertEqual(calendar.last_contribution().date, date(2024, 1, 4))
+
+    def test_totals_match_summing_the_days(self):
+        rng = random.Random(6)
+        counts = [rng.choice((0, 0, 1, 4)) for _ in range(60)]
+        calendar = self.calendar(counts)
+        first = date(2024, 1, 1)
+
+        for _ in range(300):
+            lo, hi = sorted(rng.randrange(-5, 66) for _ in range(2))
+            expected = sum(count for i, count in enumerate(counts) if lo <= i <= hi)
+            self.assertEqual(
+                calendar.total_between(first + timedelta(days=lo), first + timedelta(days=hi)),
+                expected,
+                (lo, hi)
+            )
+        self.assertEqual(calendar.total_between(date(2024, 2, 1), date(2024, 1, 1)), 0)
+
+    def test_empty_calendar(self):
+        calendar = ContributionCalendar()
+        self.assertIsNone(calendar.start)
+        self.assertIsNone(calendar.last_contribution())
+        self.assertEqual(calendar.total_between(date(2024, 1, 1), date(2024, 12, 31)), 0)
+        self.assertIsNone(self.calendar([0, 0]).last_contribution())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from src.Database.journal import Journal
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.folder = tempfile.TemporaryDirectory()
+        self.fsync_threads: list[str] = []
+        real_fsync = os.fsync
+
+        def record_fsync(fd: int) -> None:
+            self.fsync_threads.append(threading.current_thread().name)
+            real_fsync(fd)
+
+        patcher = mock.patch("src.Database.journal.os.fsync", side_effect=record_fsync)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.folder.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def journal(self, **kwargs) -> Journal:
+        journal = Journal(Path(self.folder.name), "db", **kwargs)
+        self.addCleanup(journal.close)
+        return journal
+
+    def wait_until_synced(self, journal: Journal, timeout: float = 2.0) -> None:
+        deadline: float = time.monotonic() + timeout
+        while journal.unsynced and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_appends_never_fsync_on_the_caller(self):
+        journal = self.journal(fsync_batch_size=2, fsync_interval=0.05)
+        for key in range(5):
+            journal.append("stats", str(key), {"xp": key})
+        self.wait_until_synced(journal)
+
+        self.assertEqual(journal.unsynced, 0)
+        self.assertTrue(self.fsync_threads)
+        self.assertNotIn(threading.current_thread().name, self.fsync_threads)
+
+    def test_idle_tail_is_synced_within_the_interval(self):
+        journal = self.journal(fsync_batch_size=100, fsync_interval=0.05)
+        journal.append("stats", "a", {"xp": 1})
+        self.assertEqual(journal.unsynced, 1)
+
+        self.wait_until_synced(journal, timeout=1.0)
+        self.assertEqual(journal.unsynced, 0)
+
+    def test_rotated_segments_replay_in_order(self):
+        journal = self.journal(fsync_interval=0.05)
+        journal.append("stats", "a", {"xp": 1})
+        retired: list[Path] = journal.rotate()
+        journal.append_batch([("stats", "a", {"xp": 2}), ("stats", "b", {"xp": 3})])
+        journal.sync()
+
+        self.assertEqual(len(retired), 1)
+        self.assertEqual(
+            [(key, data["xp"]) for _, key, data in journal.replay()],
+            [("a", 1), ("a", 2), ("b", 3)]
+        )
+        journal.discard(retired)
+        self.assertEqual([(key, data["xp"]) for _, key, data in journal.replay()], [("a", 2), ("b", 3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import logging
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from src.API.model import Checkin, User
+from src.Database.in_memory_database_facade import InMemoryDatabaseFacade
+from src.Database.in_memory_db import InMemoryDatabase
+from src.Database.model import DatabaseSettings
+
+
+class JournalRecoveryTest(unittest.IsolatedAsyncioTestCase):
+    """ Each facade stands in for one run of the bot over the same save folder
+    """
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.folder = tempfile.TemporaryDirectory()
+        self.settings = DatabaseSettings(
+            save_filename="db.json",
+            save_folder=self.folder.name,
+            journal_compact_threshold=3
+        )
+
+    def tearDown(self):
+        self.folder.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def open_facade(self) -> InMemoryDatabaseFacade:
+        facade = InMemoryDatabaseFacade(InMemoryDatabase("KodaDB"), self.settings)
+        facade.load_db()
+        return facade
+
+    async def test_replayed_records_survive_a_delta_save(self):
+        first = self.open_facade()
+        await first.create_missing_user_data(User(id="a"))
+        self.assertEqual((await first.save_db(permanent=True)).kind, "full")
+        await first.create_missing_user_data(User(id="b"))
+        # Crash: b is only in the journal
+        first.journal.close()
+
+        second = self.open_facade()
+        self.assertTrue(await second.has_user("b"))
+        await second.create_missing_user_data(User(id="c"))
+        await second.create_missing_user_data(User(id="d"))
+        self.assertEqual((await second.save_db()).kind, "delta")
+        second.journal.close()
+
+        third = self.open_facade()
+        for user_id in ("a", "b", "c", "d"):
+            self.assertTrue(await third.has_user(user_id), f"user {user_id} was lost")
+        third.journal.close()
+
+    async def add_checkin(self, facade: InMemoryDatabaseFacade, checkin: Checkin) -> None:
+        async with facade.transaction(checkin.user_id) as unit_of_work:
+            unit_of_work.add_checkin(checkin)
+
+    async def test_checkin_history_is_rebuilt_from_journal_and_deltas(self):
+        started = datetime(2025, 1, 1)
+        first = self.open_facade()
+        await first.create_missing_user_data(User(id="a"))
+        await self.add_checkin(first, Checkin(user_id="a", date=started, proof="first"))
+        await first.save_db(permanent=True)
+        for day in range(1, 4):
+            await self.add_checkin(first, Checkin(user_id="a", date=started + timedelta(days=day), proof="later"))
+        # Checkins journal one record each, the history index is never journaled
+        self.assertNotIn('user_checkins', {table for table, _, _ in first.journal.replay()})
+        first.journal.close()
+
+        second = self.open_facade()
+        self.assertEqual((await second.get_checkin_history("a", 1, 10)).total_checkins, 4)
+        await self.add_checkin(second, Checkin(user_id="a", date=started + timedelta(days=4), proof="last"))
+        await second.create_missing_user_data(User(id="b"))
+        self.assertEqual((await second.save_db()).kind, "delta")
+        second.journal.close()
+
+        third = self.open_facade()
+        page = await third.get_checkin_history("a", 1, 3)
+        self.assertEqual(page.total_checkins, 5)
+        self.assertEqual([checkin.proof for checkin in page.checkins], ["last", "later", "later"])
+        self.assertEqual((await third.get_checkin_history("a", 2, 3)).checkins[-1].proof, "first")
+        third.journal.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from src.API.koda import Koda
+from src.API.model import (
+    Checkin,
+    CheckinSettings,
+    GithubContributionDay,
+    LevelingSettings,
+    User
+)
+from src.Database.model import DatabaseSettings
+from src.Database.sqlite_database_facade import SqliteDatabaseFacade
+from src.Database.sqlite_db import SqliteDatabase
+
+CHECKIN_REWARD = 500
+
+
+class SlowGithubClient:
+    """ Answers every lookup with a new contribution, after a delay
+    """
+
+    async def last_contrib(self, login: str, since: Optional[date] = None) -> GithubContributionDay:
+        await asyncio.sleep(0.05)
+        return GithubContributionDay(date=date(2025, 1, 1), count=1)
+
+    async def close(self) -> None:
+        pass
+
+
+class KodaTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.folder = tempfile.TemporaryDirectory()
+        settings = DatabaseSettings(save_filename="db.json", save_folder=self.folder.name)
+        self.database = SqliteDatabase("KodaDB", Path(self.folder.name) / settings.sqlite_filename)
+        self.koda = Koda(
+            "templates",
+            SqliteDatabaseFacade(self.database, settings),
+            CheckinSettings(base_cooldown=timedelta(hours=16)),
+            LevelingSettings(checkin_reward=CHECKIN_REWARD),
+            SlowGithubClient()
+        )
+
+    def tearDown(self):
+        self.database.close()
+        self.folder.cleanup()
+        logging.disable(logging.NOTSET)
+
+    async def test_grants_during_a_checkin_are_not_lost(self):
+        for user_id in ("a", "b"):
+            await self.koda.establish_new_user(User(id=user_id))
+        await self.koda.register_github_name("a", "octocat")
+
+        # The checkin waits on GitHub while the grants arrive
+        await asyncio.gather(
+            self.koda.checkin("a", Checkin(user_id="a", date=datetime(2025, 1, 1, 12), proof="octocat")),
+            *(self.koda.give_xp("a", 100) for _ in range(10)),
+            self.koda.give_xp_bulk({"b": 100, "a": 100})
+        )
+
+        curve = self.koda.database_facade.level_curve
+        stats = await self.koda.get_stats("a")
+        self.assertEqual(curve.apply(1, 0, CHECKIN_REWARD + 1100), (stats.level, stats.xp))
+        stats = await self.koda.get_stats("b")
+        self.assertEqual(curve.apply(1, 0, 100), (stats.level, stats.xp))
+
+
+if __name__ == "__main__":
+    unittest.main()
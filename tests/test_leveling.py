@@ -0,0 +1,50 @@
+import unittest
+
+from src.API.leveling import LevelCurve
+
+
+class LevelCurveTest(unittest.TestCase):
+
+    def apply_one_level_at_a_time(self, curve: LevelCurve, level: int, xp: int, amount: int) -> tuple[int, int]:
+        xp += amount
+        while xp >= curve.xp_to_next_level(level):
+            xp -= curve.xp_to_next_level(level)
+            level += 1
+        return level, xp
+
+    def test_thresholds_follow_the_default_curve(self):
+        curve = LevelCurve()
+        self.assertEqual(curve.threshold(1), 0)
+        self.assertEqual(curve.threshold(2), 500)
+        self.assertEqual(curve.threshold(4), 500 + 1000 + 1500)
+
+    def test_matches_leveling_one_level_at_a_time(self):
+        curve = LevelCurve()
+        for level, xp in ((1, 0), (1, 499), (3, 1200), (12, 0)):
+            for amount in (0, 1, 499, 500, 501, 7_000, 123_456):
+                self.assertEqual(
+                    curve.apply(level, xp, amount),
+                    self.apply_one_level_at_a_time(curve, level, xp, amount),
+                    (level, xp, amount)
+                )
+
+    def test_custom_curve(self):
+        curve = LevelCurve(lambda level: 100)
+        self.assertEqual(curve.apply(1, 50, 275), (4, 25))
+
+    def test_rejects_negative_and_oversized_grants(self):
+        curve = LevelCurve()
+        with self.assertRaises(ValueError):
+            curve.apply(1, 0, -10)
+        with self.assertRaises(ValueError):
+            curve.apply(1, 0, LevelCurve.MAX_GRANT + 1)
+        self.assertEqual(curve.apply(1, 0, LevelCurve.MAX_GRANT)[0], 200)
+
+    def test_rejects_curves_that_stop_growing(self):
+        curve = LevelCurve(lambda level: 100 if level < 3 else 0)
+        with self.assertRaises(ValueError):
+            curve.apply(1, 0, 1_000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import random
+import unittest
+
+from src.Database.ranking import RankingIndex
+
+
+class RankingIndexTest(unittest.TestCase):
+
+    def expected_ranks(self, users: dict[str, tuple[int, int]]) -> list[tuple[int, str, int, int]]:
+        """ (rank, user id, level, xp) in leaderboard order, computed the slow way
+        """
+        ordered = sorted(users.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+        expected = []
+        for position, (user_id, (level, xp)) in enumerate(ordered, start=1):
+            tied = expected and (expected[-1][2], expected[-1][3]) == (level, xp)
+            expected.append((expected[-1][0] if tied else position, user_id, level, xp))
+        return expected
+
+    def assertMatches(self, index: RankingIndex, users: dict[str, tuple[int, int]]) -> None:
+        expected = self.expected_ranks(users)
+        self.assertEqual(len(index), len(users))
+        self.assertEqual(
+            [(entry.rank, entry.user_id, entry.level, entry.xp) for entry in index.top(len(users) + 5)],
+            expected
+        )
+        for n in (0, 1, 3, len(users) // 2):
+            self.assertEqual([entry.user_id for entry in index.top(n)], [row[1] for row in expected[:n]])
+        for rank, user_id, level, xp in expected:
+            entry = index.rank(user_id)
+            self.assertEqual((entry.rank, entry.level, entry.xp), (rank, level, xp))
+
+    def test_matches_a_sorted_reference_under_random_updates(self):
+        rng = random.Random(18)
+        index = RankingIndex()
+        index._random.seed(18)
+        users: dict[str, tuple[int, int]] = {}
+
+        for step in range(2000):
+            user_id = str(rng.randrange(150))
+            # Few distinct values, so ties come up all the time
+            users[user_id] = (rng.randrange(1, 6), rng.randrange(0, 4) * 100)
+            index.update(user_id, *users[user_id])
+            if step % 200 == 0:
+                self.assertMatches(index, users)
+
+        self.assertMatches(index, users)
+
+    def test_updates_after_a_rebuild(self):
+        rng = random.Random(24)
+        index = RankingIndex()
+        users = {str(i): (rng.randrange(1, 5), rng.randrange(0, 3) * 50) for i in range(300)}
+
+        for _ in range(3):
+            index.rebuild((user_id, level, xp) for user_id, (level, xp) in users.items())
+            self.assertMatches(index, users)
+            for _ in range(500):
+                user_id = str(rng.randrange(350))
+                users[user_id] = (rng.randrange(1, 5), rng.randrange(0, 3) * 50)
+                index.update(user_id, *users[user_id])
+            self.assertMatches(index, users)
+
+    def test_unchanged_and_unknown_users(self):
+        index = RankingIndex()
+        index.update("a", 2, 10)
+        index.update("a", 2, 10)
+        self.assertEqual(len(index), 1)
+        self.assertIsNone(index.rank("b"))
+
+        index.rebuild([])
+        self.assertEqual(index.top(5), [])
+        self.assertNotIn("a", index)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+import unittest
+
+from src.API.exceptions import GithubRateLimitError
+from src.API.rate_limit import RateLimitScheduler, RequestPriority
+
+
+class RateLimitSchedulerTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def scheduler(self, remaining: int, reset_in: float, **kwargs) -> RateLimitScheduler:
+        scheduler = RateLimitScheduler(limit=5000, **kwargs)
+        scheduler.update_from_headers({
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(time.time() + reset_in)
+        })
+        return scheduler
+
+    async def test_acquire_spends_the_budget(self):
+        scheduler = self.scheduler(remaining=10, reset_in=3000)
+        await scheduler.acquire(RequestPriority.Interactive, cost=3)
+        self.assertEqual(scheduler.state().remaining, 7)
+
+    async def test_interactive_call_fails_fast_when_exhausted(self):
+        scheduler = self.scheduler(remaining=0, reset_in=3000)
+        with self.assertRaises(GithubRateLimitError):
+            await scheduler.acquire(RequestPriority.Interactive)
+
+    async def test_background_calls_leave_the_reserve(self):
+        scheduler = self.scheduler(remaining=5, reset_in=3000, background_reserve=5)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.acquire(RequestPriority.Background), 0.05)
+        await scheduler.acquire(RequestPriority.Interactive)
+        self.assertEqual(scheduler.state().remaining, 4)
+
+    async def test_queued_calls_are_granted_in_priority_order(self):
+        scheduler = RateLimitScheduler(limit=1, interactive_max_wait=1.0)
+        scheduler.update_from_headers({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() + 0.1)})
+
+        background = asyncio.ensure_future(scheduler.acquire(RequestPriority.Background))
+        await asyncio.sleep(0)
+        # Queued second, but the one point left after the reset goes to it
+        await scheduler.acquire(RequestPriority.Interactive)
+        self.assertFalse(background.done())
+        background.cancel()
+
+    async def test_lower_remaining_wins_within_a_window(self):
+        scheduler = self.scheduler(remaining=100, reset_in=3000)
+        scheduler.update_from_headers({
+            "X-RateLimit-Remaining": "150",
+            "X-RateLimit-Reset": str(scheduler.reset_at)
+        })
+        self.assertEqual(scheduler.state().remaining, 100)
+
+    async def test_retry_after_pauses_without_spending_the_budget(self):
+        scheduler = self.scheduler(remaining=4000, reset_in=3000, interactive_max_wait=0.5)
+        scheduler.pause(0.1)
+
+        self.assertEqual(scheduler.state().remaining, 4000)
+        self.assertIsNotNone(scheduler.state().paused_until)
+        started: float = time.monotonic()
+        await scheduler.acquire(RequestPriority.Interactive)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    async def test_long_pause_refuses_interactive_calls_until_it_ends(self):
+        scheduler = self.scheduler(remaining=4000, reset_in=3000)
+        scheduler.pause(60)
+        with self.assertRaises(GithubRateLimitError) as raised:
+            await scheduler.acquire(RequestPriority.Interactive)
+        self.assertLessEqual(raised.exception.retry_after.total_seconds(), 60)
+
+    async def test_exhaust_without_a_known_reset_waits_the_fallback(self):
+        scheduler = RateLimitScheduler(limit=5000)
+        scheduler.exhaust(fallback_wait=30)
+        self.assertEqual(scheduler.state().remaining, 0)
+        self.assertAlmostEqual(scheduler.reset_at, time.time() + 30, delta=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import gzip
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.API.model import Stats, User
+from src.Database.model import DatabaseSettings
+from src.Database.schema import Schema
+from src.Database.snapshot_codec import (
+    HEADER_PREFIX,
+    CODECS,
+    BinaryCodec,
+    decode_snapshot,
+    encode_snapshot
+)
+from src.Database.snapshot_store import SnapshotStore
+
+
+def sample_schema() -> Schema:
+    return Schema(
+        users={"a": User(id="a", github_name="octocat")},
+        stats={"a": Stats(xp=10, total_xp_needed=500, level=1)}
+    )
+
+
+class SnapshotCodecTest(unittest.TestCase):
+
+    def test_every_codec_round_trips(self):
+        for name, codec in CODECS.items():
+            with self.subTest(codec=name):
+                tables = decode_snapshot(encode_snapshot(sample_schema(), codec), Schema)
+                self.assertEqual(Schema.model_construct(**tables), sample_schema())
+
+    def test_binary_snapshot_from_another_python_is_refused(self):
+        data: bytes = encode_snapshot(sample_schema(), BinaryCodec())
+        header, _, payload = data.partition(b"\n")
+        self.assertIn(b" py", header)
+
+        foreign: bytes = HEADER_PREFIX + b"binary marshal3 py2.7\n" + payload
+        with self.assertRaises(ValueError):
+            decode_snapshot(foreign, Schema)
+
+    def test_binary_store_writes_portable_backups(self):
+        logging.disable(logging.CRITICAL)
+        with tempfile.TemporaryDirectory() as folder:
+            store = SnapshotStore(DatabaseSettings(save_filename="db.json", save_folder=folder, snapshot_codec="binary"))
+            store.write_full(sample_schema(), permanent=True)
+
+            backups: list[Path] = list((Path(folder) / "backups").iterdir())
+            self.assertEqual(len(backups), 1)
+            self.assertTrue(gzip.decompress(backups[0].read_bytes()).startswith(HEADER_PREFIX + b"json\n"))
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    unittest.main()
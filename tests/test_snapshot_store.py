@@ -0,0 +1,54 @@
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.API.model import User
+from src.Database.in_memory_database_facade import InMemoryDatabaseFacade
+from src.Database.in_memory_db import InMemoryDatabase
+from src.Database.model import DatabaseSettings
+
+
+class SnapshotStoreTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.folder = tempfile.TemporaryDirectory()
+        self.settings = DatabaseSettings(
+            save_filename="db.json",
+            save_folder=self.folder.name,
+            journal_enabled=False
+        )
+
+    def tearDown(self):
+        self.folder.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def open_facade(self) -> InMemoryDatabaseFacade:
+        facade = InMemoryDatabaseFacade(InMemoryDatabase("KodaDB"), self.settings)
+        facade.load_db()
+        return facade
+
+    async def test_unreadable_delta_only_loses_its_own_records(self):
+        facade = self.open_facade()
+        await facade.create_missing_user_data(User(id="a"))
+        await facade.save_db()
+        for user_id in ("b", "c", "d"):
+            await facade.create_missing_user_data(User(id=user_id))
+            self.assertEqual((await facade.save_db()).kind, "delta")
+
+        corrupted: Path = Path(self.folder.name) / facade.snapshots.manifest.deltas[1].filename
+        corrupted.write_bytes(b"{}")
+
+        reloaded = self.open_facade()
+        self.assertTrue(await reloaded.has_user("b"))
+        self.assertFalse(await reloaded.has_user("c"))
+        self.assertTrue(await reloaded.has_user("d"))
+
+        await reloaded.create_missing_user_data(User(id="e"))
+        self.assertEqual((await reloaded.save_db()).kind, "full")
+        self.assertFalse(reloaded.snapshots.needs_full_save)
+
+
+if __name__ == "__main__":
+    unittest.main()
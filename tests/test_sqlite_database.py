@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.API.model import User
+from src.Database.model import DatabaseSettings
+from src.Database.sqlite_database_facade import SqliteDatabaseFacade
+from src.Database.sqlite_db import SqliteDatabase
+
+
+class SqliteDatabaseTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.folder = tempfile.TemporaryDirectory()
+        settings = DatabaseSettings(save_filename="db.json", save_folder=self.folder.name)
+        self.database = SqliteDatabase("KodaDB", Path(self.folder.name) / settings.sqlite_filename)
+        self.facade = SqliteDatabaseFacade(self.database, settings)
+        self.facade.load_db()
+
+    def tearDown(self):
+        self.database.close()
+        self.folder.cleanup()
+        logging.disable(logging.NOTSET)
+
+    async def test_commit_waits_for_the_write(self):
+        await self.facade.create_missing_user_data(User(id="a"))
+        self.assertTrue(await self.facade.give_xp("a", 500))
+
+        self.assertEqual((await self.facade.get_stats("a")).level, 2)
+        self.assertEqual(self.facade.get_rank("a").level, 2)
+
+    async def test_concurrent_grants_are_not_lost(self):
+        await self.facade.create_missing_user_data(User(id="a"))
+        await self.facade.create_missing_user_data(User(id="b"))
+
+        await asyncio.gather(
+            *(self.facade.give_xp("a", 100) for _ in range(20)),
+            *(self.facade.give_xp_bulk({"b": 100, "a": 50}) for _ in range(4))
+        )
+
+        stats = await self.facade.get_stats("a")
+        self.assertEqual(self.facade.level_curve.apply(1, 0, 2200), (stats.level, stats.xp))
+        stats = await self.facade.get_stats("b")
+        self.assertEqual(self.facade.level_curve.apply(1, 0, 400), (stats.level, stats.xp))
+
+    async def test_failed_write_raises_and_is_not_ranked(self):
+        await self.facade.create_missing_user_data(User(id="a"))
+        await self.facade.save_db()
+        self.database._call(lambda: self.database._connection.execute(
+            "CREATE TRIGGER fail_stats BEFORE INSERT ON stats BEGIN SELECT RAISE(ABORT, 'write failed'); END"
+        ))
+
+        with self.assertRaises(sqlite3.DatabaseError):
+            await self.facade.give_xp("a", 500)
+
+        self.assertEqual((await self.facade.get_stats("a")).level, 1)
+        self.assertEqual(self.facade.get_rank("a").level, 1)
+        self.assertFalse(self.facade.has_unsaved_changes())
+
+    async def test_close_leaves_everything_in_the_main_file(self):
+        await self.facade.create_missing_user_data(User(id="a"))
+        await self.facade.give_xp("a", 500)
+        await self.facade.close()
+
+        wal = self.database.filepath.with_name(self.database.filepath.name + "-wal")
+        self.assertFalse(wal.exists() and wal.stat().st_size > 0)
+
+        reopened = SqliteDatabase("KodaDB", self.database.filepath)
+        self.assertEqual(reopened.get_record('stats', "a").level, 2)
+        reopened.close()
+
+
+if __name__ == "__main__":
+    unittest.main()